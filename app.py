@@ -4,21 +4,31 @@ Main Streamlit Dashboard Application
 """
 
 import streamlit as st
-import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
+import numpy as np
 from datetime import datetime, timedelta
 import logging
+import math
 
 # Import custom modules
 from database import get_connection, create_tables
 from queries import LogisticsQueries
-from data_ingestion import ingest_all_data
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Upper bound on points sent to the browser per scatter trace
+MAX_PLOT_POINTS = 1000
+
+# Rows per page for tables whose row count grows with the data: the shipment
+# filter results, a shipment's tracking history and the unlimited
+# delivery-time-vs-distance table. The other dashboard tables are already
+# capped by a LIMIT well under this and are shown whole.
+PAGE_SIZE = 200
+
+# Layout shared by every figure
+BASE_LAYOUT = dict(margin=dict(l=40, r=20, t=40, b=40), font=dict(size=12))
+
 # Set page configuration
 st.set_page_config(
     page_title="Logistics Analytics Dashboard",
@@ -44,10 +54,147 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 
+def load_plotly():
+    """
+    Import plotly.graph_objects on first use and apply the shared template.
+    
+    Plotly is only imported by pages that draw charts, so the Home page and
+    cold starts skip its import cost; later calls hit the sys.modules cache.
+    """
+    import plotly.graph_objects as go
+    import plotly.io as pio
+    
+    pio.templates.default = "plotly_white"
+    return go
+
+
+@st.cache_data(ttl=300, show_spinner=False)
+def cached_query(name, *args):
+    """
+    Run a LogisticsQueries method by name and memoize its result.
+    
+    Streamlit reruns the whole script on every widget interaction, so
+    caching here turns repeat page renders into a lookup instead of a
+    MySQL roundtrip.
+    """
+    return getattr(LogisticsQueries, name)(*args)
+
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def cached_lookup(name):
+    """Memoize slow-changing dropdown lookups (origins, statuses, etc.)."""
+    return getattr(LogisticsQueries, name)()
+
+
+def bar_chart(df, x, y, title, x_label=None, y_label=None):
+    """
+    Build a bar chart from two DataFrame columns.
+    
+    Uses plotly.graph_objects directly; the charts only hold 10-20 rows,
+    so plotly.express' DataFrame introspection would dominate build time.
+    """
+    go = load_plotly()
+    fig = go.Figure(go.Bar(x=df[x].tolist(), y=df[y].tolist()), layout=BASE_LAYOUT)
+    fig.update_layout(title=title, xaxis_title=x_label or x, yaxis_title=y_label or y)
+    return fig
+
+
+def downsample_lttb(df, x, y, threshold=MAX_PLOT_POINTS):
+    """
+    Downsample rows with Largest-Triangle-Three-Buckets (LTTB).
+    
+    Keeps the points that best preserve the visual shape of the (x, y)
+    series, so chart payload and render time stay bounded as data grows.
+    
+    Args:
+        df (pandas.DataFrame): Rows to plot
+        x (str): X-axis column
+        y (str): Y-axis column
+        threshold (int): Maximum number of rows to keep
+        
+    Returns:
+        pandas.DataFrame: At most `threshold` rows of df, ordered by x
+    """
+    if len(df) <= threshold or threshold < 3:
+        return df
+    
+    df = df.dropna(subset=[x, y]).sort_values(x)
+    xs = df[x].to_numpy(dtype=float)
+    ys = df[y].to_numpy(dtype=float)
+    n = len(xs)
+    if n <= threshold:
+        return df
+    
+    bucket_size = (n - 2) / (threshold - 2)
+    keep = np.empty(threshold, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+    
+    selected = 0
+    for i in range(threshold - 2):
+        start = int(i * bucket_size) + 1
+        end = int((i + 1) * bucket_size) + 1
+        next_end = min(int((i + 2) * bucket_size) + 1, n)
+        avg_x = xs[end:next_end].mean()
+        avg_y = ys[end:next_end].mean()
+        
+        # Pick the point forming the largest triangle with the previous pick
+        # and the average of the next bucket
+        areas = np.abs((xs[selected] - avg_x) * (ys[start:end] - ys[selected])
+                       - (xs[selected] - xs[start:end]) * (avg_y - ys[selected]))
+        selected = start + int(np.argmax(areas))
+        keep[i + 1] = selected
+    
+    return df.iloc[keep]
+
+
+def scatter_chart(df, x, y, size, hover, title, webgl=False):
+    """
+    Build a bubble chart with area-scaled markers, matching px.scatter sizing.
+    
+    Pass webgl=True for plots whose row count grows with the data; SVG
+    scatter traces become the rendering bottleneck past a few thousand points.
+    """
+    go = load_plotly()
+    df = downsample_lttb(df, x, y)
+    trace = go.Scattergl if webgl else go.Scatter
+    fig = go.Figure(trace(
+        x=df[x].tolist(),
+        y=df[y].tolist(),
+        mode='markers',
+        hovertext=df[hover].tolist(),
+        marker=dict(size=df[size].tolist(), sizemode='area',
+                    sizeref=max(df[size].max(), 1) / 20 ** 2)
+    ), layout=BASE_LAYOUT)
+    fig.update_layout(title=title, xaxis_title=x, yaxis_title=y)
+    return fig
+
+
+def page_selector(total_rows, key, page_size=PAGE_SIZE):
+    """
+    Render a page picker for a result set and return the chosen page's row offset.
+    
+    The current page lives in st.session_state under `key`, so it survives reruns.
+    """
+    total_pages = max(math.ceil(total_rows / page_size), 1)
+    if total_pages == 1:
+        return 0
+    page = st.number_input(f"Page (of {total_pages})", min_value=1, max_value=total_pages,
+                           step=1, key=key)
+    return (page - 1) * page_size
+
+
+def paginate(df, key, page_size=PAGE_SIZE):
+    """Show one page of a DataFrame so only page_size rows are sent to the browser."""
+    offset = page_selector(len(df), key, page_size)
+    st.dataframe(df.iloc[offset:offset + page_size], use_container_width=True)
+
+
 def initialize_database():
     """Initialize database and load data if needed."""
     try:
         create_tables()
+        st.cache_data.clear()
+        LogisticsQueries.clear_caches()
         st.success("✅ Database initialized successfully")
     except Exception as e:
         logger.error(f"Database initialization error: {e}")
@@ -59,11 +206,12 @@ def display_kpis():
     col1, col2, col3, col4, col5 = st.columns(5)
     
     try:
-        total_shipments = LogisticsQueries.get_total_shipments()
-        delivered_pct = LogisticsQueries.get_delivered_percentage()
-        cancelled_pct = LogisticsQueries.get_cancelled_percentage()
-        avg_delivery_time = LogisticsQueries.get_average_delivery_time()
-        total_cost = LogisticsQueries.get_total_operational_cost()
+        kpis = cached_query("get_operational_kpis")
+        total_shipments = kpis['total']
+        delivered_pct = kpis['delivered_pct']
+        cancelled_pct = kpis['cancelled_pct']
+        avg_delivery_time = kpis['avg_days']
+        total_cost = kpis['total_cost']
         
         with col1:
             st.metric("📦 Total Shipments", f"{total_shipments:,}")
@@ -85,40 +233,60 @@ def display_kpis():
         logger.error(f"KPI loading error: {e}")
 
 
+@st.fragment
+def route_time_tab(df):
+    """Average delivery time per route."""
+    if not df.empty:
+        st.dataframe(df, use_container_width=True)
+        fig = bar_chart(df.head(15), 'destination', 'avg_days',
+                        title="Average Delivery Days by Destination",
+                        x_label='Destination', y_label='Days')
+        st.plotly_chart(fig, use_container_width=True)
+
+
+@st.fragment
+def delayed_routes_tab(df):
+    """Most delayed routes."""
+    if not df.empty:
+        st.dataframe(df, use_container_width=True)
+        fig = scatter_chart(df, 'distance_km', 'avg_delivery_days',
+                            size='num_shipments', hover='destination',
+                            title="Delayed Routes (Size = Shipment Count)")
+        st.plotly_chart(fig, use_container_width=True)
+
+
+@st.fragment
+def time_distance_tab(df):
+    """Delivery delay against route distance; paging reruns only this tab."""
+    if not df.empty:
+        paginate(df, key="time_distance_page")
+        fig = scatter_chart(df, 'distance_km', 'delay_days',
+                            size='num_shipments', hover='destination',
+                            title="Delivery Delay vs Distance", webgl=True)
+        fig.add_hline(y=0, line_dash="dash", line_color="red")
+        st.plotly_chart(fig, use_container_width=True)
+
+
 def display_delivery_performance():
     """Display delivery performance insights."""
     st.subheader("📈 Delivery Performance Insights")
     
     try:
+        data = cached_query("run_concurrently",
+                            "get_average_delivery_time_per_route",
+                            "get_most_delayed_routes",
+                            "get_delivery_time_vs_distance")
+        
         tab1, tab2, tab3 = st.tabs(["Avg Time by Route", "Most Delayed Routes", "Time vs Distance"])
         
         with tab1:
-            df = LogisticsQueries.get_average_delivery_time_per_route()
-            if not df.empty:
-                st.dataframe(df, use_container_width=True)
-                fig = px.bar(df.head(15), x='destination', y='avg_days', 
-                           title="Average Delivery Days by Destination",
-                           labels={'avg_days': 'Days', 'destination': 'Destination'})
-                st.plotly_chart(fig, use_container_width=True)
+            route_time_tab(data["get_average_delivery_time_per_route"])
         
         with tab2:
-            df = LogisticsQueries.get_most_delayed_routes()
-            if not df.empty:
-                st.dataframe(df, use_container_width=True)
-                fig = px.scatter(df, x='distance_km', y='avg_delivery_days', 
-                               size='num_shipments', hover_name='destination',
-                               title="Delayed Routes (Size = Shipment Count)")
-                st.plotly_chart(fig, use_container_width=True)
+            delayed_routes_tab(data["get_most_delayed_routes"])
         
         with tab3:
-            df = LogisticsQueries.get_delivery_time_vs_distance()
-            if not df.empty:
-                st.dataframe(df, use_container_width=True)
-                fig = px.scatter(df, x='distance_km', y='delay_days',
-                               size='num_shipments', hover_name='destination',
-                               title="Delivery Delay vs Distance")
-                fig.add_hline(y=0, line_dash="dash", line_color="red")
-                st.plotly_chart(fig, use_container_width=True)
+            time_distance_tab(data["get_delivery_time_vs_distance"])
     
     except Exception as e:
         st.error(f"Error loading delivery performance data: {e}")
@@ -130,32 +298,41 @@ def display_courier_performance():
     st.subheader("👥 Courier Performance")
     
     try:
+        data = cached_query("run_concurrently",
+                            "get_courier_performance",
+                            "get_ontime_delivery_by_courier",
+                            "get_courier_rating_comparison")
+        
         tab1, tab2, tab3 = st.tabs(["Overall Performance", "On-Time Delivery", "Rating Comparison"])
         
         with tab1:
-            df = LogisticsQueries.get_courier_performance()
+            df = data["get_courier_performance"]
             if not df.empty:
                 st.dataframe(df, use_container_width=True)
-                fig = px.bar(df.head(10), x='name', y='num_shipments',
-                           title="Top 10 Couriers by Shipment Count",
-                           labels={'num_shipments': 'Shipments', 'name': 'Courier Name'})
+                fig = bar_chart(df.head(10), 'name', 'num_shipments',
+                                title="Top 10 Couriers by Shipment Count",
+                                x_label='Courier Name', y_label='Shipments')
                 st.plotly_chart(fig, use_container_width=True)
         
         with tab2:
-            df = LogisticsQueries.get_ontime_delivery_by_courier()
+            df = data["get_ontime_delivery_by_courier"]
             if not df.empty:
                 st.dataframe(df, use_container_width=True)
-                fig = px.scatter(df, x='avg_days', y='delivery_success_rate',
-                               size='delivered', hover_name='name',
-                               title="Courier Delivery Success vs Avg Days")
+                fig = scatter_chart(df, 'avg_days', 'delivery_success_rate',
+                                    size='delivered', hover='name',
+                                    title="Courier Delivery Success vs Avg Days")
                 st.plotly_chart(fig, use_container_width=True)
         
         with tab3:
-            df = LogisticsQueries.get_courier_rating_comparison()
+            df = data["get_courier_rating_comparison"]
             if not df.empty:
                 st.dataframe(df, use_container_width=True)
-                fig = px.line(df, x='rating', y='delivery_rate',
-                            markers=True, title="Delivery Success Rate by Courier Rating")
+                go = load_plotly()
+                fig = go.Figure(go.Scatter(x=df['rating'].tolist(), y=df['delivery_rate'].tolist(),
+                                           mode='lines+markers'),
+                                layout=BASE_LAYOUT)
+                fig.update_layout(title="Delivery Success Rate by Courier Rating",
+                                  xaxis_title='rating', yaxis_title='delivery_rate')
                 st.plotly_chart(fig, use_container_width=True)
     
     except Exception as e:
@@ -168,44 +345,52 @@ def display_cost_analytics():
     st.subheader("💰 Cost Analytics")
     
     try:
+        data = cached_query("run_concurrently",
+                            "get_high_cost_shipments",
+                            "get_cost_per_route",
+                            "get_fuel_vs_labor_contribution_scalars",
+                            "get_cost_per_shipment")
+        
         tab1, tab2, tab3, tab4 = st.tabs(["Top High-Cost", "Cost by Route", "Fuel vs Labor", "Cost per KG"])
         
         with tab1:
-            df = LogisticsQueries.get_high_cost_shipments()
+            df = data["get_high_cost_shipments"]
             if not df.empty:
                 st.dataframe(df, use_container_width=True)
-                fig = px.bar(df.head(15), x='shipment_id', y='total_cost',
-                           title="Top 15 High-Cost Shipments",
-                           labels={'total_cost': 'Cost ($)', 'shipment_id': 'Shipment ID'})
+                fig = bar_chart(df.head(15), 'shipment_id', 'total_cost',
+                                title="Top 15 High-Cost Shipments",
+                                x_label='Shipment ID', y_label='Cost ($)')
                 st.plotly_chart(fig, use_container_width=True)
         
         with tab2:
-            df = LogisticsQueries.get_cost_per_route()
+            df = data["get_cost_per_route"]
             if not df.empty:
                 st.dataframe(df, use_container_width=True)
-                fig = px.bar(df.head(10), x='destination', y='total_cost',
-                           title="Top 10 Routes by Total Cost",
-                           labels={'total_cost': 'Cost ($)', 'destination': 'Destination'})
+                fig = bar_chart(df.head(10), 'destination', 'total_cost',
+                                title="Top 10 Routes by Total Cost",
+                                x_label='Destination', y_label='Cost ($)')
                 st.plotly_chart(fig, use_container_width=True)
         
         with tab3:
-            df = LogisticsQueries.get_fuel_vs_labor_contribution()
-            if not df.empty:
+            fuel_pct, labor_pct, misc_pct = data["get_fuel_vs_labor_contribution_scalars"]
+            if fuel_pct is not None:
+                go = load_plotly()
                 fig = go.Figure(data=[go.Pie(
                     labels=['Fuel', 'Labor', 'Misc'],
-                    values=[df['fuel_percent'].values[0], 
-                           df['labor_percent'].values[0],
-                           df['misc_percent'].values[0]],
+                    values=[fuel_pct, labor_pct, misc_pct],
                     title="Cost Contribution %"
-                )])
+                )], layout=BASE_LAYOUT)
                 st.plotly_chart(fig, use_container_width=True)
-                st.dataframe(df, use_container_width=True)
+                
+                col1, col2, col3 = st.columns(3)
+                col1.metric("Fuel %", f"{fuel_pct:.2f}%")
+                col2.metric("Labor %", f"{labor_pct:.2f}%")
+                col3.metric("Misc %", f"{misc_pct:.2f}%")
         
         with tab4:
-            df = LogisticsQueries.get_cost_per_shipment()
+            df = data["get_cost_per_shipment"]
             if not df.empty:
-                df['cost_per_kg'] = (df['total_cost'] / df['weight']).round(2)
-                st.dataframe(df.head(20), use_container_width=True)
+                st.dataframe(df, use_container_width=True)
     
     except Exception as e:
         st.error(f"Error loading cost analytics: {e}")
@@ -217,28 +402,33 @@ def display_cancellation_analysis():
     st.subheader("❌ Cancellation Analysis")
     
     try:
+        data = cached_query("run_concurrently",
+                            "get_cancellation_rate_by_origin",
+                            "get_cancellation_rate_by_courier",
+                            "get_time_to_cancellation")
+        
         tab1, tab2, tab3 = st.tabs(["By Origin", "By Courier", "Time to Cancellation"])
         
         with tab1:
-            df = LogisticsQueries.get_cancellation_rate_by_origin()
+            df = data["get_cancellation_rate_by_origin"]
             if not df.empty:
                 st.dataframe(df, use_container_width=True)
-                fig = px.bar(df.head(15), x='origin', y='cancellation_rate',
-                           title="Cancellation Rate by Origin City",
-                           labels={'cancellation_rate': 'Rate (%)', 'origin': 'City'})
+                fig = bar_chart(df.head(15), 'origin', 'cancellation_rate',
+                                title="Cancellation Rate by Origin City",
+                                x_label='City', y_label='Rate (%)')
                 st.plotly_chart(fig, use_container_width=True)
         
         with tab2:
-            df = LogisticsQueries.get_cancellation_rate_by_courier()
+            df = data["get_cancellation_rate_by_courier"]
             if not df.empty:
                 st.dataframe(df, use_container_width=True)
-                fig = px.bar(df.head(10), x='name', y='cancellation_rate',
-                           title="Cancellation Rate by Courier",
-                           labels={'cancellation_rate': 'Rate (%)', 'name': 'Courier'})
+                fig = bar_chart(df.head(10), 'name', 'cancellation_rate',
+                                title="Cancellation Rate by Courier",
+                                x_label='Courier', y_label='Rate (%)')
                 st.plotly_chart(fig, use_container_width=True)
         
         with tab3:
-            df = LogisticsQueries.get_time_to_cancellation()
+            df = data["get_time_to_cancellation"]
             if not df.empty:
                 st.dataframe(df, use_container_width=True)
     
@@ -252,19 +442,23 @@ def display_warehouse_insights():
     st.subheader("🏢 Warehouse Insights")
     
     try:
+        data = cached_query("run_concurrently",
+                            "get_warehouse_capacity_comparison",
+                            "get_high_traffic_warehouses")
+        
         tab1, tab2 = st.tabs(["Capacity Comparison", "High-Traffic Warehouses"])
         
         with tab1:
-            df = LogisticsQueries.get_warehouse_capacity_comparison()
+            df = data["get_warehouse_capacity_comparison"]
             if not df.empty:
                 st.dataframe(df, use_container_width=True)
-                fig = px.bar(df.head(15), x='city', y='utilization_rate',
-                           title="Warehouse Utilization Rate (%)",
-                           labels={'utilization_rate': 'Rate (%)', 'city': 'City'})
+                fig = bar_chart(df.head(15), 'city', 'utilization_rate',
+                                title="Warehouse Utilization Rate (%)",
+                                x_label='City', y_label='Rate (%)')
                 st.plotly_chart(fig, use_container_width=True)
         
         with tab2:
-            df = LogisticsQueries.get_high_traffic_warehouses()
+            df = data["get_high_traffic_warehouses"]
             if not df.empty:
                 st.dataframe(df, use_container_width=True)
     
@@ -273,101 +467,138 @@ def display_warehouse_insights():
         logger.error(f"Warehouse insights error: {e}")
 
 
+@st.fragment
+def shipment_lookup():
+    """Look up a single shipment and its tracking history by ID."""
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        search_id = st.text_input("Search by Shipment ID", "")
+    
+    with col2:
+        search_button = st.button("🔍 Search", use_container_width=True)
+    
+    if search_button and search_id:
+        # Keep the looked-up ID so paging the tracking history can rerun it
+        st.session_state['lookup_id'] = search_id
+        st.session_state['tracking_page'] = 1
+    
+    lookup_id = st.session_state.get('lookup_id')
+    if lookup_id:
+        result = LogisticsQueries.search_shipment(lookup_id)
+        if result:
+            st.success(f"Found Shipment: {lookup_id}")
+            st.dataframe([result], use_container_width=True)
+            
+            # Display tracking history
+            tracking = LogisticsQueries.get_shipment_tracking_history(lookup_id)
+            if tracking:
+                st.subheader("📍 Tracking History")
+                offset = page_selector(len(tracking), key="tracking_page")
+                st.dataframe(tracking[offset:offset + PAGE_SIZE], use_container_width=True)
+        else:
+            st.warning("Shipment not found")
+
+
+@st.fragment
+def shipment_filter_panel(options):
+    """
+    Render the filter controls and the paged results.
+    
+    Runs as a fragment, so applying filters or paging reruns only this
+    panel. Applied filters are kept in st.session_state between reruns.
+    
+    Args:
+        options (dict): Dropdown values from LogisticsQueries.get_filter_options
+    """
+    origins = options['origins']
+    destinations = options['destinations']
+    couriers = [f"{courier_id} - {name}" for courier_id, name in options['couriers']]
+    statuses = options['statuses']
+    
+    col1, col2, col3, col4 = st.columns(4)
+    
+    with col1:
+        filter_status = st.selectbox("Status", [None] + statuses, key="filter_status")
+    
+    with col2:
+        filter_origin = st.selectbox("Origin", [None] + origins, key="filter_origin")
+    
+    with col3:
+        filter_destination = st.selectbox("Destination", [None] + destinations, key="filter_destination")
+    
+    with col4:
+        filter_courier = st.selectbox("Courier", [None] + couriers, key="filter_courier")
+    
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        start_date = st.date_input("Start Date", value=None, key="filter_start_date")
+    
+    with col2:
+        end_date = st.date_input("End Date", value=None, key="filter_end_date")
+    
+    filter_button = st.button("🔍 Apply Filters", use_container_width=True)
+    
+    if filter_button:
+        courier_id = None
+        if filter_courier:
+            courier_id = filter_courier.split(" - ")[0]
+        
+        # Keep the applied filters so paging reruns can re-query them
+        st.session_state['shipment_filters'] = dict(
+            status=filter_status,
+            origin=filter_origin,
+            destination=filter_destination,
+            start_date=start_date,
+            end_date=end_date,
+            courier_id=courier_id
+        )
+        st.session_state['shipment_page'] = 1
+    
+    filters = st.session_state.get('shipment_filters')
+    if filters is not None:
+        with LogisticsQueries.session() as queries:
+            summary = queries.get_shipment_filter_summary(**filters)
+            results = None
+            if summary['total']:
+                offset = page_selector(summary['total'], key="shipment_page")
+                results = queries.filter_shipments(**filters, limit=PAGE_SIZE, offset=offset)
+        
+        if summary['total']:
+            st.success(f"Found {summary['total']} shipments")
+            st.dataframe(results, use_container_width=True)
+            
+            # Display summary statistics
+            st.subheader("Summary Statistics")
+            col1, col2, col3 = st.columns(3)
+            
+            with col1:
+                st.metric("Total Shipments", summary['total'])
+            
+            with col2:
+                st.metric("Delivered", summary['delivered'])
+            
+            with col3:
+                st.metric("Cancelled", summary['cancelled'])
+        else:
+            st.warning("No shipments found matching the criteria")
+
+
 def display_shipment_search():
     """Display shipment search and filtering interface."""
     st.subheader("🔎 Shipment Search & Filtering")
     
     try:
         # Get filter options
-        origins = LogisticsQueries.get_unique_origins()['origin'].tolist()
-        destinations = LogisticsQueries.get_unique_destinations()['destination'].tolist()
-        couriers_df = LogisticsQueries.get_unique_couriers()
-        couriers = [f"{row['courier_id']} - {row['name']}" for _, row in couriers_df.iterrows()]
-        statuses = LogisticsQueries.get_shipment_statuses()['status'].tolist()
-        
-        col1, col2 = st.columns(2)
+        options = cached_lookup("get_filter_options")
         
-        with col1:
-            search_id = st.text_input("Search by Shipment ID", "")
-        
-        with col2:
-            search_button = st.button("🔍 Search", use_container_width=True)
-        
-        if search_button and search_id:
-            result = LogisticsQueries.search_shipment(search_id)
-            if not result.empty:
-                st.success(f"Found Shipment: {search_id}")
-                st.dataframe(result, use_container_width=True)
-                
-                # Display tracking history
-                tracking = LogisticsQueries.get_shipment_tracking_history(search_id)
-                if not tracking.empty:
-                    st.subheader("📍 Tracking History")
-                    st.dataframe(tracking, use_container_width=True)
-            else:
-                st.warning("Shipment not found")
+        shipment_lookup()
         
         st.divider()
         st.write("**Apply Filters Below:**")
         
-        col1, col2, col3, col4 = st.columns(4)
-        
-        with col1:
-            filter_status = st.selectbox("Status", [None] + statuses, key="filter_status")
-        
-        with col2:
-            filter_origin = st.selectbox("Origin", [None] + origins, key="filter_origin")
-        
-        with col3:
-            filter_destination = st.selectbox("Destination", [None] + destinations, key="filter_destination")
-        
-        with col4:
-            filter_courier = st.selectbox("Courier", [None] + couriers, key="filter_courier")
-        
-        col1, col2 = st.columns(2)
-        
-        with col1:
-            start_date = st.date_input("Start Date", value=None)
-        
-        with col2:
-            end_date = st.date_input("End Date", value=None)
-        
-        filter_button = st.button("🔍 Apply Filters", use_container_width=True)
-        
-        if filter_button:
-            courier_id = None
-            if filter_courier:
-                courier_id = filter_courier.split(" - ")[0]
-            
-            results = LogisticsQueries.filter_shipments(
-                status=filter_status,
-                origin=filter_origin,
-                destination=filter_destination,
-                start_date=start_date,
-                end_date=end_date,
-                courier_id=courier_id
-            )
-            
-            if not results.empty:
-                st.success(f"Found {len(results)} shipments")
-                st.dataframe(results, use_container_width=True)
-                
-                # Display summary statistics
-                st.subheader("Summary Statistics")
-                col1, col2, col3 = st.columns(3)
-                
-                with col1:
-                    st.metric("Total Shipments", len(results))
-                
-                with col2:
-                    delivered = len(results[results['status'] == 'Delivered'])
-                    st.metric("Delivered", delivered)
-                
-                with col3:
-                    cancelled = len(results[results['status'] == 'Cancelled'])
-                    st.metric("Cancelled", cancelled)
-            else:
-                st.warning("No shipments found matching the criteria")
+        shipment_filter_panel(options)
     
     except Exception as e:
         st.error(f"Error in shipment search: {e}")
@@ -389,7 +620,11 @@ def main():
     if st.sidebar.button("📥 Load Data"):
         with st.spinner("Loading data from CSV/JSON files..."):
             try:
+                from data_ingestion import ingest_all_data
+                
                 ingest_all_data(".")
+                st.cache_data.clear()
+                LogisticsQueries.clear_caches()
                 st.sidebar.success("✅ Data loaded successfully!")
             except Exception as e:
                 st.sidebar.error(f"Error loading data: {e}")
@@ -4,50 +4,91 @@ Handles parsing, validation, and batch insertion of logistics data.
 """
 
 import csv
-import json
+import os
+import ijson
 import pandas as pd
-from database import get_connection
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from operator import itemgetter
+from database import get_connection, refresh_fact_table, bulk_insert
 import logging
 from mysql.connector import Error
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-BATCH_SIZE = 500  # Insert records in batches for better performance
+BATCH_SIZE = 1000  # Insert records in batches for better performance
 
+# Error codes raised when LOAD DATA LOCAL INFILE is disabled on the client or server
+LOCAL_INFILE_ERRNOS = (1148, 2068, 3948)
 
-def load_json_file(filepath):
+# CSV column types in file order. Timestamps stay as text for MySQL to parse.
+TRACKING_SCHEMA = {'tracking_id': 'int64', 'shipment_id': 'str', 'status': 'str', 'timestamp': 'str'}
+COURIER_SCHEMA = {'courier_id': 'str', 'name': 'str', 'rating': 'float64', 'vehicle_type': 'str'}
+ROUTE_SCHEMA = {'route_id': 'str', 'origin': 'str', 'destination': 'str',
+                'distance_km': 'float64', 'avg_time_hours': 'float64'}
+COST_SCHEMA = {'shipment_id': 'str', 'fuel_cost': 'float64', 'labor_cost': 'float64', 'misc_cost': 'float64'}
+
+# JSON record keys, in table column order
+SHIPMENT_KEYS = ('shipment_id', 'order_date', 'origin', 'destination', 'weight',
+                 'courier_id', 'status', 'delivery_date')
+WAREHOUSE_KEYS = ('warehouse_id', 'city', 'state', 'capacity')
+
+# (table, file, columns, format, column refreshed on duplicate key), grouped
+# into phases. Tables within a phase have no foreign keys between them and
+# load concurrently; phases run in order so parent tables load first.
+INGEST_PLAN = [
+    [
+        ("courier_staff", "courier_staff.csv", COURIER_SCHEMA, "csv", "rating"),
+        ("routes", "routes.csv", ROUTE_SCHEMA, "csv", "distance_km"),
+        ("warehouses", "warehouses.json", WAREHOUSE_KEYS, "json", "capacity"),
+    ],
+    [
+        ("shipments", "shipments.json", SHIPMENT_KEYS, "json", "status"),
+    ],
+    [
+        ("costs", "costs.csv", COST_SCHEMA, "csv", "fuel_cost"),
+        ("shipment_tracking", "shipment_tracking.csv", TRACKING_SCHEMA, "csv", "status"),
+    ],
+]
+
+
+def iter_json_records(filepath):
     """
-    Load JSON data from file.
+    Stream records from a JSON array file one at a time.
+    
+    The array is never materialized, so memory stays constant and the
+    first batch can be inserted while the rest is parsed.
     
     Args:
-        filepath (str): Path to JSON file
+        filepath (str): Path to JSON file containing a top-level array
         
-    Returns:
-        list: List of dictionaries from JSON
+    Yields:
+        dict: One record from the array
     """
-    try:
-        with open(filepath, 'r') as f:
-            data = json.load(f)
-        logger.info(f"Loaded {len(data)} records from {filepath}")
-        return data
-    except Exception as e:
-        logger.error(f"Error loading JSON file {filepath}: {e}")
-        raise
+    with open(filepath, 'rb') as f:
+        yield from ijson.items(f, 'item')
 
 
-def load_csv_file(filepath):
+def load_csv_file(filepath, dtype=None, usecols=None, parse_dates=None):
     """
     Load CSV data from file.
     
+    Passing the known schema skips pandas' dtype inference and keeps
+    numeric columns out of object dtype.
+    
     Args:
         filepath (str): Path to CSV file
+        dtype (dict): Optional column name to dtype mapping
+        usecols (list): Optional subset of columns to read
+        parse_dates (list): Optional columns to parse as datetimes
         
     Returns:
         pandas.DataFrame: DataFrame with CSV data
     """
     try:
-        df = pd.read_csv(filepath)
+        df = pd.read_csv(filepath, dtype=dtype, usecols=usecols,
+                         parse_dates=parse_dates, engine='c')
         logger.info(f"Loaded {len(df)} records from {filepath}")
         return df
     except Exception as e:
@@ -55,301 +96,194 @@ def load_csv_file(filepath):
         raise
 
 
-def insert_shipments(json_file):
+@contextmanager
+def bulk_load_session(conn):
     """
-    Insert shipment records from JSON file into shipments table.
+    Relax per-row integrity checks on a connection during a bulk load.
+    
+    Files are loaded in foreign key order, so unique and foreign key
+    checks are switched off for the session and restored afterwards.
     
     Args:
-        json_file (str): Path to shipments.json
+        conn: Open database connection
     """
+    cursor = conn.cursor()
+    cursor.execute("SET unique_checks = 0, foreign_key_checks = 0")
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        
-        data = load_json_file(json_file)
-        
-        insert_query = """
-            INSERT INTO shipments 
-            (shipment_id, order_date, origin, destination, weight, courier_id, status, delivery_date)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-            ON DUPLICATE KEY UPDATE status = VALUES(status)
-        """
-        
-        batch = []
-        for i, record in enumerate(data):
-            batch.append((
-                record.get('shipment_id'),
-                record.get('order_date'),
-                record.get('origin'),
-                record.get('destination'),
-                record.get('weight'),
-                record.get('courier_id'),
-                record.get('status'),
-                record.get('delivery_date')
-            ))
-            
-            if len(batch) >= BATCH_SIZE or i == len(data) - 1:
-                cursor.executemany(insert_query, batch)
-                conn.commit()
-                logger.info(f"Inserted {len(batch)} shipment records")
-                batch = []
-        
+        yield
+    finally:
+        cursor.execute("SET unique_checks = 1, foreign_key_checks = 1")
         cursor.close()
-        conn.close()
-        logger.info(f"Successfully inserted all shipment records from {json_file}")
-        
-    except Error as e:
-        logger.error(f"Error inserting shipments: {e}")
-        raise
 
 
-def insert_shipment_tracking(csv_file):
+def load_csv_infile(cursor, table, csv_file, columns, update_column):
     """
-    Insert shipment tracking records from CSV file.
+    Bulk load a CSV file with LOAD DATA LOCAL INFILE.
+    
+    Rows are staged in a temporary copy of the table and merged with a single
+    INSERT ... SELECT so existing keys are updated like the batched path.
     
     Args:
-        csv_file (str): Path to shipment_tracking.csv
+        cursor: Open database cursor
+        table (str): Target table name
+        csv_file (str): Path to CSV file with a header row
+        columns (list): Column names in file order
+        update_column (str): Column refreshed when the key already exists
     """
+    staging = f"{table}_staging"
+    column_list = ", ".join(columns)
+    # The last field is read into a variable so CRLF files load cleanly
+    field_list = ", ".join(columns[:-1] + ["@last_field"])
+    
+    cursor.execute(f"CREATE TEMPORARY TABLE {staging} LIKE {table}")
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        
-        df = load_csv_file(csv_file)
-        
-        insert_query = """
-            INSERT INTO shipment_tracking 
-            (tracking_id, shipment_id, status, timestamp)
-            VALUES (%s, %s, %s, %s)
-            ON DUPLICATE KEY UPDATE status = VALUES(status)
-        """
-        
-        batch = []
-        for i, row in df.iterrows():
-            batch.append((
-                row['tracking_id'],
-                row['shipment_id'],
-                row['status'],
-                row['timestamp']
-            ))
-            
-            if len(batch) >= BATCH_SIZE or i == len(df) - 1:
-                cursor.executemany(insert_query, batch)
-                conn.commit()
-                logger.info(f"Inserted {len(batch)} tracking records")
-                batch = []
-        
-        cursor.close()
-        conn.close()
-        logger.info(f"Successfully inserted all tracking records from {csv_file}")
-        
-    except Error as e:
-        logger.error(f"Error inserting shipment tracking: {e}")
-        raise
+        cursor.execute(f"""
+            LOAD DATA LOCAL INFILE %s INTO TABLE {staging}
+            FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '"'
+            LINES TERMINATED BY '\\n'
+            IGNORE 1 LINES
+            ({field_list})
+            SET {columns[-1]} = TRIM(TRAILING '\\r' FROM @last_field)
+        """, (os.path.abspath(csv_file),))
+        
+        cursor.execute(f"""
+            INSERT INTO {table} ({column_list})
+            SELECT {column_list} FROM {staging}
+            ON DUPLICATE KEY UPDATE {update_column} = VALUES({update_column})
+        """)
+        logger.info(f"Loaded {cursor.rowcount} {table} rows via LOAD DATA LOCAL INFILE")
+    finally:
+        cursor.execute(f"DROP TEMPORARY TABLE IF EXISTS {staging}")
 
 
-def insert_courier_staff(csv_file):
+def load_csv_data(cursor, table, csv_file, schema, update_column):
     """
-    Insert courier staff records from CSV file.
+    Upsert CSV rows into a table, preferring LOAD DATA LOCAL INFILE.
+    
+    Falls back to batched multi-row inserts when local infile is
+    disabled on the client or server. The caller owns the transaction.
     
     Args:
-        csv_file (str): Path to courier_staff.csv
+        cursor: Open database cursor
+        table (str): Target table name
+        csv_file (str): Path to CSV file
+        schema (dict): Column name to pandas dtype, in file order
+        update_column (str): Column refreshed when the key already exists
     """
+    columns = list(schema)
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        
-        df = load_csv_file(csv_file)
-        
-        insert_query = """
-            INSERT INTO courier_staff 
-            (courier_id, name, rating, vehicle_type)
-            VALUES (%s, %s, %s, %s)
-            ON DUPLICATE KEY UPDATE rating = VALUES(rating)
-        """
-        
-        batch = []
-        for i, row in df.iterrows():
-            batch.append((
-                row['courier_id'],
-                row['name'],
-                row['rating'],
-                row['vehicle_type']
-            ))
-            
-            if len(batch) >= BATCH_SIZE:
-                cursor.executemany(insert_query, batch)
-                conn.commit()
-                batch = []
-        
-        if batch:
-            cursor.executemany(insert_query, batch)
-            conn.commit()
-        
-        cursor.close()
-        conn.close()
-        logger.info(f"Successfully inserted all courier staff records from {csv_file}")
-        
+        load_csv_infile(cursor, table, csv_file, columns, update_column)
+        return
     except Error as e:
-        logger.error(f"Error inserting courier staff: {e}")
-        raise
+        if e.errno not in LOCAL_INFILE_ERRNOS:
+            raise
+        logger.warning(f"LOAD DATA LOCAL INFILE unavailable ({e}); using batched inserts for {table}")
+    
+    df = load_csv_file(csv_file, dtype=schema, usecols=columns)
+    bulk_insert(cursor, table, columns, df[columns].to_numpy().tolist(), update_column, BATCH_SIZE)
 
 
-def insert_routes(csv_file):
+def load_json_data(cursor, table, json_file, columns, update_column):
     """
-    Insert route records from CSV file.
+    Upsert records from a JSON array file in batches.
     
     Args:
-        csv_file (str): Path to routes.csv
+        cursor: Open database cursor
+        table (str): Target table name
+        json_file (str): Path to JSON file
+        columns (tuple): Record keys, in table column order
+        update_column (str): Column refreshed when the key already exists
     """
-    try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        
-        df = load_csv_file(csv_file)
-        
-        insert_query = """
-            INSERT INTO routes 
-            (route_id, origin, destination, distance_km, avg_time_hours)
-            VALUES (%s, %s, %s, %s, %s)
-            ON DUPLICATE KEY UPDATE distance_km = VALUES(distance_km)
-        """
-        
-        batch = []
-        for i, row in df.iterrows():
-            batch.append((
-                row['route_id'],
-                row['origin'],
-                row['destination'],
-                row['distance_km'],
-                row['avg_time_hours']
-            ))
-            
-            if len(batch) >= BATCH_SIZE:
-                cursor.executemany(insert_query, batch)
-                conn.commit()
-                batch = []
-        
-        if batch:
-            cursor.executemany(insert_query, batch)
-            conn.commit()
-        
-        cursor.close()
-        conn.close()
-        logger.info(f"Successfully inserted all route records from {csv_file}")
-        
-    except Error as e:
-        logger.error(f"Error inserting routes: {e}")
-        raise
+    get_row = itemgetter(*columns)
+    batch = []
+    for record in iter_json_records(json_file):
+        try:
+            row = get_row(record)
+        except KeyError:
+            # Optional fields such as delivery_date may be missing
+            row = tuple(record.get(key) for key in columns)
+        batch.append(row)
+        
+        if len(batch) >= BATCH_SIZE:
+            bulk_insert(cursor, table, columns, batch, update_column, BATCH_SIZE)
+            batch = []
+    
+    if batch:
+        bulk_insert(cursor, table, columns, batch, update_column, BATCH_SIZE)
 
 
-def insert_warehouses(json_file):
+def bulk_load(conn, table, path, columns, fmt, update_column):
     """
-    Insert warehouse records from JSON file.
+    Load one source file into its table.
     
     Args:
-        json_file (str): Path to warehouses.json
+        conn: Open database connection (caller commits)
+        table (str): Target table name
+        path (str): Path to the source file
+        columns: Column names in file order; a name to dtype mapping for CSV
+        fmt (str): 'csv' or 'json'
+        update_column (str): Column refreshed when the key already exists
     """
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        
-        data = load_json_file(json_file)
+        with conn.cursor() as cursor:
+            if fmt == "csv":
+                load_csv_data(cursor, table, path, columns, update_column)
+            else:
+                load_json_data(cursor, table, path, columns, update_column)
         
-        insert_query = """
-            INSERT INTO warehouses 
-            (warehouse_id, city, state, capacity)
-            VALUES (%s, %s, %s, %s)
-            ON DUPLICATE KEY UPDATE capacity = VALUES(capacity)
-        """
-        
-        batch = []
-        for i, record in enumerate(data):
-            batch.append((
-                record.get('warehouse_id'),
-                record.get('city'),
-                record.get('state'),
-                record.get('capacity')
-            ))
-            
-            if len(batch) >= BATCH_SIZE:
-                cursor.executemany(insert_query, batch)
-                conn.commit()
-                batch = []
-        
-        if batch:
-            cursor.executemany(insert_query, batch)
-            conn.commit()
-        
-        cursor.close()
-        conn.close()
-        logger.info(f"Successfully inserted all warehouse records from {json_file}")
+        logger.info(f"Successfully inserted all {table} records from {path}")
         
     except Error as e:
-        logger.error(f"Error inserting warehouses: {e}")
+        logger.error(f"Error inserting {table}: {e}")
         raise
 
 
-def insert_costs(csv_file):
+def run_bulk_load(base_path, table, filename, columns, fmt, update_column):
     """
-    Insert cost records from CSV file.
+    Run one INGEST_PLAN entry on its own connection and commit it.
+    
+    mysql-connector connections are not thread-safe, so every worker
+    thread checks out a dedicated connection. Pooled connections are in
+    autocommit mode, so the load opens its own transaction.
     
     Args:
-        csv_file (str): Path to costs.csv
+        base_path (str): Directory containing the source files
+        table, filename, columns, fmt, update_column: One INGEST_PLAN entry
     """
+    conn = get_connection()
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        
-        df = load_csv_file(csv_file)
-        
-        insert_query = """
-            INSERT INTO costs 
-            (shipment_id, fuel_cost, labor_cost, misc_cost)
-            VALUES (%s, %s, %s, %s)
-            ON DUPLICATE KEY UPDATE fuel_cost = VALUES(fuel_cost)
-        """
-        
-        batch = []
-        for i, row in df.iterrows():
-            batch.append((
-                row['shipment_id'],
-                row['fuel_cost'],
-                row['labor_cost'],
-                row['misc_cost']
-            ))
-            
-            if len(batch) >= BATCH_SIZE or i == len(df) - 1:
-                cursor.executemany(insert_query, batch)
-                conn.commit()
-                logger.info(f"Inserted {len(batch)} cost records")
-                batch = []
-        
-        cursor.close()
-        conn.close()
-        logger.info(f"Successfully inserted all cost records from {csv_file}")
-        
-    except Error as e:
-        logger.error(f"Error inserting costs: {e}")
+        conn.start_transaction()
+        with bulk_load_session(conn):
+            bulk_load(conn, table, os.path.join(base_path, filename), columns, fmt, update_column)
+        conn.commit()
+    except Exception:
+        conn.rollback()
         raise
+    finally:
+        conn.close()
 
 
 def ingest_all_data(base_path):
     """
     Ingest all logistics data from CSV and JSON files.
     
+    Runs INGEST_PLAN phase by phase, loading the tables within each phase
+    concurrently, then rebuilds the shipment_facts reporting table.
+    
     Args:
         base_path (str): Base directory path containing all data files
     """
     try:
         logger.info("Starting data ingestion process...")
         
-        # Insert in the correct order to avoid foreign key constraints
-        insert_courier_staff(f"{base_path}/courier_staff.csv")
-        insert_routes(f"{base_path}/routes.csv")
-        insert_warehouses(f"{base_path}/warehouses.json")
-        insert_shipments(f"{base_path}/shipments.json")
-        insert_costs(f"{base_path}/costs.csv")
-        insert_shipment_tracking(f"{base_path}/shipment_tracking.csv")
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            for phase in INGEST_PLAN:
+                futures = [executor.submit(run_bulk_load, base_path, *spec) for spec in phase]
+                # result() re-raises the first failure before the next phase starts
+                for future in futures:
+                    future.result()
+        
+        refresh_fact_table()
         
         logger.info("Data ingestion completed successfully!")
         
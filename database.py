@@ -3,42 +3,101 @@ Database connection and schema management module.
 Handles MySQL database connection and table creation.
 """
 
-import mysql.connector
 from mysql.connector import Error
+from mysql.connector import pooling
+from mysql.connector.errors import PoolError
 import logging
+import threading
+import time
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+
 DB_CONFIG = {
     'host': 'localhost',
     'user': 'root',
     'password': 'your_password',
-    'database': 'logistic'
+    'database': 'logistic',
+    'allow_local_infile': True  # Needed for LOAD DATA LOCAL INFILE bulk loads
 }
 
+# (table, index, columns) for composite indexes serving the dashboard queries:
+# the shipment search filters and summary counts, covering indexes for the
+# per-courier and per-origin status aggregates, and an index-only cost sum.
+COMPOSITE_INDEXES = [
+    ("shipments", "idx_shipment_filter", "status, order_date, origin, destination, courier_id"),
+    ("shipments", "idx_status_courier_delivery", "status, courier_id, delivery_date, order_date"),
+    ("shipments", "idx_origin_status", "origin, status"),
+    ("shipments", "idx_courier_status", "courier_id, status"),
+    ("costs", "idx_ship_fuel_labor", "shipment_id, fuel_cost, labor_cost, misc_cost"),
+]
 
-def get_connection():
+POOL_SIZE = 10  # Roughly 2x cores on the dashboard host
+POOL_WAIT_SECONDS = 10  # How long get_connection waits for a connection to be returned
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
     """
-    Establish and return a MySQL database connection.
+    Return the shared connection pool, creating it on first use.
     
+    Sessions are not reset on check-in, which saves a round-trip per
+    query. Pooled connections therefore run in autocommit mode so a read
+    never leaves a transaction (and its snapshot) open for the next
+    borrower; writers call start_transaction() explicitly.
+    
+    Returns:
+        mysql.connector.pooling.MySQLConnectionPool: Shared pool
+    """
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = pooling.MySQLConnectionPool(
+                    pool_name="logistics",
+                    pool_size=POOL_SIZE,
+                    pool_reset_session=False,
+                    autocommit=True,
+                    **DB_CONFIG
+                )
+                logger.info(f"Database connection pool created (size {POOL_SIZE})")
+    return _pool
 
 
+def get_connection():
+    """
+    Check out a MySQL database connection from the shared pool.
+    
+    The pool itself fails at once when every connection is in use, so
+    checkout is retried with backoff for up to POOL_WAIT_SECONDS while
+    concurrent queries, sessions and ingestion threads return theirs.
+    Calling close() on the returned connection hands it back to the pool.
     
     Returns:
-        mysql.connector.connection.MySQLConnection: Database connection object
+        mysql.connector.pooling.PooledMySQLConnection: Database connection object
         
     Raises:
-        Error: If connection fails
+        Error: If connection fails or the pool stays exhausted
     """
-    try:
-        conn = mysql.connector.connect(**DB_CONFIG)
-        logger.info("Database connection successful")
-        return conn
-    except Error as e:
-        logger.error(f"Error connecting to database: {e}")
-        raise
+    pool = get_pool()
+    deadline = time.monotonic() + POOL_WAIT_SECONDS
+    delay = 0.01
+    while True:
+        try:
+            return pool.get_connection()
+        except PoolError as e:
+            if time.monotonic() >= deadline:
+                logger.error(f"No pooled connection freed up within {POOL_WAIT_SECONDS}s: {e}")
+                raise
+            time.sleep(delay)
+            delay = min(delay * 2, 0.25)
+        except Error as e:
+            logger.error(f"Error connecting to database: {e}")
+            raise
 
 
 def create_tables():
@@ -136,23 +195,176 @@ def create_tables():
                 fuel_cost DECIMAL(15, 2),
                 labor_cost DECIMAL(15, 2),
                 misc_cost DECIMAL(15, 2),
+                total_cost DECIMAL(15, 2) AS (fuel_cost + labor_cost + misc_cost) STORED,
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                 INDEX idx_fuel_cost (fuel_cost),
+                INDEX idx_total_cost (total_cost DESC),
                 FOREIGN KEY (shipment_id) REFERENCES shipments(shipment_id)
             )
         """)
         logger.info("Costs table created")
         
+        # Add the generated total to costs tables created before it existed;
+        # 1060 means the column is already there
+        try:
+            cursor.execute("""
+                ALTER TABLE costs
+                ADD COLUMN total_cost DECIMAL(15, 2) AS (fuel_cost + labor_cost + misc_cost) STORED,
+                ADD INDEX idx_total_cost (total_cost DESC)
+            """)
+            logger.info("Costs total_cost column added")
+        except Error as e:
+            if e.errno != 1060:
+                raise
+        
+        # Composite indexes, issued separately so existing databases pick them up;
+        # 1061 means the index already exists.
+        for table, index, columns in COMPOSITE_INDEXES:
+            try:
+                cursor.execute(f"CREATE INDEX {index} ON {table} ({columns})")
+                logger.info(f"Index {index} created on {table}")
+            except Error as e:
+                if e.errno != 1061:
+                    raise
+        
+        # Create shipment_facts table: shipments flattened with their route and
+        # costs so dashboard aggregates scan one table instead of joining three.
+        # Rebuilt by refresh_fact_table after data loads.
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS shipment_facts (
+                shipment_id VARCHAR(50) PRIMARY KEY,
+                order_date DATE NOT NULL,
+                origin VARCHAR(100) NOT NULL,
+                destination VARCHAR(100) NOT NULL,
+                weight DECIMAL(10, 2) NOT NULL,
+                courier_id VARCHAR(50),
+                status VARCHAR(50) NOT NULL,
+                delivery_date DATE,
+                distance_km DECIMAL(10, 2),
+                avg_time_hours DECIMAL(5, 2),
+                fuel_cost DECIMAL(15, 2),
+                labor_cost DECIMAL(15, 2),
+                misc_cost DECIMAL(15, 2),
+                total_cost DECIMAL(15, 2),
+                delivery_days INT,
+                INDEX idx_origin_destination (origin, destination),
+                INDEX idx_courier_id (courier_id),
+                INDEX idx_status_delivery_date (status, delivery_date),
+                INDEX idx_total_cost (total_cost)
+            )
+        """)
+        logger.info("Shipment_facts table created")
+        
+        # Databases loaded before shipment_facts existed need it built now,
+        # or the dashboards reading it stay empty until the next ingestion
+        cursor.execute("SELECT EXISTS(SELECT 1 FROM shipments), EXISTS(SELECT 1 FROM shipment_facts)")
+        has_shipments, has_facts = cursor.fetchone()
+        
         conn.commit()
         logger.info("All tables created successfully")
         cursor.close()
         conn.close()
         
+        if has_shipments and not has_facts:
+            refresh_fact_table()
+        
     except Error as e:
         logger.error(f"Error creating tables: {e}")
         raise
 
 
+def build_insert_query(table, columns, num_rows=1, update_column=None):
+    """
+    Build a parameterized multi-row INSERT, optionally as an upsert.
+    
+    Args:
+        table (str): Target table name
+        columns (list): Column names in parameter order
+        num_rows (int): Number of VALUES tuples in the statement
+        update_column (str): Column refreshed when the key already exists;
+            None for a plain INSERT
+        
+    Returns:
+        str: SQL with one %s placeholder per column per row
+    """
+    row_placeholder = f"({', '.join(['%s'] * len(columns))})"
+    query = f"""
+        INSERT INTO {table}
+        ({', '.join(columns)})
+        VALUES {', '.join([row_placeholder] * num_rows)}
+    """
+    if update_column:
+        query += f"    ON DUPLICATE KEY UPDATE {update_column} = VALUES({update_column})\n"
+    return query
+
+
+def bulk_insert(cursor, table, columns, rows, update_column=None, batch=1000):
+    """
+    Insert rows with one multi-row INSERT statement per batch.
+    
+    Each batch costs a single parse and round-trip. This is the insert
+    path for all loaders; the caller owns the transaction.
+    
+    Args:
+        cursor: Open database cursor
+        table (str): Target table name
+        columns (list): Column names in row order
+        rows (list): Row tuples or lists
+        update_column (str): Column refreshed when the key already exists
+        batch (int): Rows per INSERT statement
+    """
+    for start in range(0, len(rows), batch):
+        chunk = rows[start:start + batch]
+        query = build_insert_query(table, columns, len(chunk), update_column)
+        cursor.execute(query, [value for row in chunk for value in row])
+    logger.info(f"Inserted {len(rows)} {table} records")
+
+
+def refresh_fact_table():
+    """
+    Rebuild shipment_facts from shipments, routes and costs.
+    
+    Run after shipments or costs change; the route, cost and courier
+    dashboards read from shipment_facts rather than joining on every render.
+    The table is emptied and refilled in one transaction, so facts for
+    deleted shipments go away and readers never see it half built.
+    """
+    conn = get_connection()
+    try:
+        cursor = conn.cursor()
+        
+        conn.start_transaction()
+        cursor.execute("DELETE FROM shipment_facts")
+        # REPLACE rather than INSERT: routes does not enforce one row per
+        # origin/destination, so a shipment can join more than one route
+        cursor.execute("""
+            REPLACE INTO shipment_facts (
+                shipment_id, order_date, origin, destination, weight, courier_id, status,
+                delivery_date, distance_km, avg_time_hours, fuel_cost, labor_cost, misc_cost,
+                total_cost, delivery_days
+            )
+            SELECT 
+                s.shipment_id, s.order_date, s.origin, s.destination, s.weight, s.courier_id, s.status,
+                s.delivery_date, r.distance_km, r.avg_time_hours, c.fuel_cost, c.labor_cost, c.misc_cost,
+                c.total_cost,
+                DATEDIFF(s.delivery_date, s.order_date)
+            FROM shipments s
+            LEFT JOIN routes r ON s.origin = r.origin AND s.destination = r.destination
+            LEFT JOIN costs c ON s.shipment_id = c.shipment_id
+        """)
+        logger.info(f"Shipment_facts rebuilt ({cursor.rowcount} rows)")
+        
+        conn.commit()
+        cursor.close()
+        
+    except Error as e:
+        logger.error(f"Error refreshing shipment_facts: {e}")
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
 def drop_all_tables():
     """
     Drop all tables from the database (use with caution).
@@ -162,11 +374,22 @@ def drop_all_tables():
         conn = get_connection()
         cursor = conn.cursor()
         
-        tables = ['shipment_tracking', 'costs', 'shipments', 'courier_staff', 'routes', 'warehouses']
+        tables = ['shipment_facts', 'shipment_tracking', 'costs', 'shipments', 'courier_staff', 'routes', 'warehouses']
         
-        for table in tables:
-            cursor.execute(f"DROP TABLE IF EXISTS {table}")
-            logger.info(f"Dropped table {table}")
+        # One round-trip; with foreign key checks off the drop order doesn't matter
+        statements = (
+            "SET FOREIGN_KEY_CHECKS = 0; "
+            f"DROP TABLE IF EXISTS {', '.join(tables)}; "
+            "SET FOREIGN_KEY_CHECKS = 1"
+        )
+        try:
+            for _ in cursor.execute(statements, multi=True):
+                pass
+        except Error:
+            # Pooled sessions aren't reset, so never return one with checks disabled
+            cursor.execute("SET FOREIGN_KEY_CHECKS = 1")
+            raise
+        logger.info(f"Dropped tables {', '.join(tables)}")
         
         conn.commit()
         cursor.close()
@@ -3,175 +3,570 @@ SQL queries module for logistics analytics and KPI calculations.
 Contains optimized queries for insights and performance metrics.
 """
 
-from database import get_connection
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing, contextmanager
+import copy
+import functools
+import inspect
+from urllib.parse import quote
+from database import get_connection, DB_CONFIG
+from mysql.connector import Error
 import logging
+import threading
+import time
+import numpy as np
 import pandas as pd
 
+try:
+    # Optional: reads result sets straight into columnar buffers
+    import connectorx
+except ImportError:
+    connectorx = None
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+CX_URL = (f"mysql://{quote(DB_CONFIG['user'], safe='')}:{quote(DB_CONFIG['password'], safe='')}"
+          f"@{DB_CONFIG['host']}/{DB_CONFIG['database']}")
+
+KPI_TTL_SECONDS = 60  # How long get_operational_kpis reuses its result
+FILTER_OPTIONS_TTL_SECONDS = 3600  # How long get_filter_options reuses its result
+RESULT_TTL_SECONDS = 30  # How long read-only analytics queries reuse their result
+TTL_CACHE_MAXSIZE = 128  # Argument combinations each ttl_cached function keeps
+
+QUERY_WORKERS = 4  # Concurrent queries per run_concurrently call; kept below the pool size
+
+DEFAULT_CHUNKSIZE = 10_000  # Rows per DataFrame chunk when streaming a result
+
+# Connection pinned by LogisticsQueries.session() for the current thread
+_session = threading.local()
+
+# Every ttl_cached result store, so clear_caches() can empty them all
+_ttl_caches = []
+
+
+def ttl_cached(seconds, maxsize=TTL_CACHE_MAXSIZE):
+    """
+    Memoize a function's result per call arguments for `seconds`.
+    
+    Arguments are bound to the signature first, so f(7) and f(days=7)
+    share an entry. Each caller gets its own copy of a cached DataFrame
+    or dict, so mutating a result never leaks into later calls. Expired
+    entries are purged whenever a new result is stored, and past `maxsize`
+    the least recently used entry is evicted.
+    
+    Args:
+        seconds (float): How long a cached result stays valid
+        maxsize (int): Most argument combinations kept at once
+    """
+    def decorator(func):
+        cache = OrderedDict()
+        lock = threading.Lock()
+        _ttl_caches.append(cache)
+        signature = inspect.signature(func)
+        
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            key = tuple(bound.arguments.items())
+            with lock:
+                entry = cache.get(key)
+                if entry is not None and time.monotonic() - entry[0] < seconds:
+                    cache.move_to_end(key)
+                    return _private_copy(entry[1])
+            
+            entry = (time.monotonic(), func(*args, **kwargs))
+            with lock:
+                expired = [k for k, (stored, _) in cache.items() if entry[0] - stored >= seconds]
+                for k in expired:
+                    del cache[k]
+                cache[key] = entry
+                cache.move_to_end(key)
+                while len(cache) > maxsize:
+                    cache.popitem(last=False)
+            return _private_copy(entry[1])
+        
+        wrapper.cache_clear = cache.clear
+        return wrapper
+    return decorator
+
+
+def _private_copy(result):
+    """Copy a mutable cached result so callers cannot alter the cached one."""
+    if isinstance(result, pd.DataFrame):
+        return result.copy()
+    if isinstance(result, (dict, list)):
+        return copy.deepcopy(result)
+    return result
+
+
+@contextmanager
+def pooled_connection():
+    """
+    Check out a pooled connection and always return it, even on error.
+    
+    Inside LogisticsQueries.session() the thread's pinned connection is
+    used instead, and left open for the session to release. If the block
+    fails, the connection's prepared cursors and any unread result are
+    discarded first so the next borrower starts clean.
+    
+    Yields:
+        mysql.connector.pooling.PooledMySQLConnection: Database connection
+    """
+    conn = getattr(_session, 'conn', None)
+    pinned = conn is not None
+    if not pinned:
+        conn = get_connection()
+    try:
+        yield conn
+    except Exception:
+        discard_prepared(conn)
+        raise
+    finally:
+        if not pinned:
+            conn.close()
+
+
+def _prepared_cache(conn):
+    """
+    Get the prepared cursors of conn's physical connection, keyed by SQL text.
+    
+    Pooled sessions are never reset, so statements stay prepared across
+    checkouts. The cache lives on the physical connection, so it is freed
+    with it, and starts afresh when a reconnect changes the connection id.
+    """
+    raw = getattr(conn, '_cnx', conn)  # PooledMySQLConnection wraps the real connection
+    cache = getattr(raw, '_prepared_cursors', None)
+    if cache is None or cache[0] != conn.connection_id:
+        cache = (conn.connection_id, {})
+        raw._prepared_cursors = cache
+    return cache[1]
+
+
+def discard_prepared(conn):
+    """
+    Close conn's cached prepared cursors and drain any unread result.
+    
+    Args:
+        conn: Open database connection
+    """
+    raw = getattr(conn, '_cnx', conn)
+    cache = getattr(raw, '_prepared_cursors', None)
+    raw._prepared_cursors = None
+    try:
+        for cursor, _ in (cache[1].values() if cache else ()):
+            cursor.close()
+        conn.consume_results()
+    except Error as e:
+        # A broken connection is reconnected by the pool on next checkout
+        logger.warning(f"Error resetting connection after a failed query: {e}")
+
+
+def execute_prepared(conn, query, params=None):
+    """
+    Execute a query through a server-side prepared statement, preparing it
+    only the first time it runs on this connection.
+    
+    Args:
+        conn: Open database connection
+        query (str): SQL query with %s placeholders
+        params (tuple): Query parameters
+        
+    Returns:
+        mysql.connector.cursor.MySQLCursorPrepared: Cursor with the result pending
+    """
+    cursors = _prepared_cache(conn)
+    cached = cursors.get(query)
+    if cached is None:
+        cached = (conn.cursor(prepared=True), query)
+        cursors[query] = cached
+    
+    cursor, prepared_query = cached
+    # The cursor re-prepares unless handed the very string object it prepared
+    cursor.execute(prepared_query, tuple(params or ()))
+    return cursor
+
+
+# Shipment search conditions in bitmask order: bit i set means filter i applies
+SHIPMENT_FILTERS = (
+    ('status', "status = %s"),
+    ('origin', "origin = %s"),
+    ('destination', "destination = %s"),
+    ('start_date', "order_date >= %s"),
+    ('end_date', "order_date <= %s"),
+    ('courier_id', "courier_id = %s"),
+)
+
+
+def build_filter_sql(template):
+    """
+    Render a query once for every combination of SHIPMENT_FILTERS.
+    
+    Args:
+        template (str): SQL with a {where} placeholder
+        
+    Returns:
+        list: SQL text indexed by filter bitmask
+    """
+    variants = []
+    for mask in range(1 << len(SHIPMENT_FILTERS)):
+        where = "WHERE 1=1" + "".join(
+            f" AND {condition}" for bit, (_, condition) in enumerate(SHIPMENT_FILTERS) if mask >> bit & 1)
+        variants.append(template.format(where=where))
+    return variants
+
+
+# Built at import so each filter shape always sends the same SQL text and
+# reuses one prepared statement per connection
+FILTER_ROWS_SQL = build_filter_sql("SELECT * FROM shipments {where} ORDER BY shipment_id")
+FILTER_PAGE_SQL = build_filter_sql("SELECT * FROM shipments {where} ORDER BY shipment_id LIMIT %s OFFSET %s")
+FILTER_SUMMARY_SQL = build_filter_sql("""
+    SELECT 
+        COUNT(*) as total,
+        SUM(status = 'Delivered') as delivered,
+        SUM(status = 'Cancelled') as cancelled
+    FROM shipments
+    {where}
+""")
+
+# ORDER BY expression for each get_top_couriers metric
+COURIER_RANKINGS = {
+    'shipments': "COUNT(s.shipment_id)",
+    'rating': "c.rating",
+    'delivery_rate': "SUM(s.status = 'Delivered') / NULLIF(COUNT(s.shipment_id), 0)",
+}
+COURIER_RANKING_SQL = {
+    metric: f"""
+        SELECT 
+            c.courier_id,
+            c.name,
+            c.vehicle_type,
+            c.rating,
+            COUNT(s.shipment_id) as num_shipments,
+            COALESCE(SUM(s.status = 'Delivered'), 0) as delivered_count,
+            COALESCE(SUM(s.status = 'Cancelled'), 0) as cancelled_count
+        FROM courier_staff c
+        LEFT JOIN shipment_facts s ON c.courier_id = s.courier_id
+        GROUP BY c.courier_id, c.name, c.vehicle_type, c.rating
+        ORDER BY {order} DESC
+        LIMIT %s
+    """
+    for metric, order in COURIER_RANKINGS.items()
+}
+
+
+def percent(numerator, denominator):
+    """
+    Vectorised ROUND(numerator * 100 / denominator, 2).
+    
+    Rates are computed here rather than in SQL so MySQL only accumulates
+    integer counts per row. Zero denominators give NaN, like SQL's NULL.
+    """
+    numerator = np.asarray(numerator, dtype=float)
+    denominator = np.asarray(denominator, dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.round(np.where(denominator == 0, np.nan, numerator * 100.0 / denominator), 2)
+
+
+def stream_query(query, params=None, chunksize=DEFAULT_CHUNKSIZE):
+    """
+    Stream a query's result as DataFrame chunks from an unbuffered cursor.
+    
+    Only one chunk is held client-side at a time, so memory stays bounded
+    however many rows the query returns. Close the generator (for example
+    with contextlib.closing) if you stop reading early, so the leftover
+    rows are drained before the connection is released.
+    
+    Args:
+        query (str): SQL query
+        params (tuple): Query parameters
+        chunksize (int): Rows per yielded DataFrame
+        
+    Yields:
+        pandas.DataFrame: Up to `chunksize` rows
+    """
+    with pooled_connection() as conn, conn.cursor(buffered=False) as cursor:
+        try:
+            cursor.execute(query, tuple(params or ()))
+            for rows in iter(lambda: cursor.fetchmany(chunksize), []):
+                yield pd.DataFrame.from_records(rows, columns=cursor.column_names, coerce_float=True)
+        finally:
+            # Drain anything left unread if the consumer stopped early
+            conn.consume_results()
+
 
 class LogisticsQueries:
     """Container for all logistics-related SQL queries."""
     
     @staticmethod
-    def get_connection_and_execute(query, params=None):
+    def get_connection_and_execute(query, params=None, stream=False, chunksize=DEFAULT_CHUNKSIZE):
         """
         Execute a query and return results as pandas DataFrame.
         
+        Unparameterised queries go through connectorx when it is installed,
+        which builds the DataFrame column by column without Python row tuples.
+        Otherwise, repeat calls reuse the connection's prepared statement, so
+        MySQL skips parsing and planning and only the parameters go over the wire.
+        
         Args:
             query (str): SQL query
             params (tuple): Query parameters
+            stream (bool): Return an iterator of DataFrame chunks (see stream_query)
+                instead of one DataFrame, for unbounded results such as exports
+            chunksize (int): Rows per chunk when streaming
             
         Returns:
-            pandas.DataFrame: Query results
+            pandas.DataFrame: Query results, or an iterator of chunks when stream is set
         """
+        if stream:
+            return stream_query(query, params, chunksize)
+        
         try:
-            conn = get_connection()
-            if params:
-                df = pd.read_sql(query, conn, params=params)
-            else:
-                df = pd.read_sql(query, conn)
-            conn.close()
-            return df
+            if connectorx is not None and not params:
+                return connectorx.read_sql(CX_URL, query, return_type='pandas')
+            
+            with pooled_connection() as conn:
+                cursor = execute_prepared(conn, query, params)
+                return pd.DataFrame.from_records(cursor.fetchall(), columns=cursor.column_names,
+                                                 coerce_float=True)
+        except Exception as e:
+            logger.error(f"Error executing query: {e}")
+            raise
+    
+    @staticmethod
+    def _fetch_row(query, params=None):
+        """
+        Execute a single-row query and return it as a dict, without pandas.
+        
+        Args:
+            query (str): SQL query returning at most one row
+            params (tuple): Query parameters
+            
+        Returns:
+            dict: Column name to raw value (Decimal, int, date, ...); empty if no row
+        """
+        rows = LogisticsQueries._fetch_all_dicts(query, params)
+        return rows[0] if rows else {}
+    
+    @staticmethod
+    def _fetch_all_dicts(query, params=None):
+        """
+        Execute a query and return its rows as dicts, without pandas.
+        
+        Args:
+            query (str): SQL query
+            params (tuple): Query parameters
+            
+        Returns:
+            list: One dict per row, keyed by column name
+        """
+        try:
+            with pooled_connection() as conn:
+                cursor = execute_prepared(conn, query, params)
+                rows = cursor.fetchall()
+                columns = cursor.column_names
+                return [dict(zip(columns, row)) for row in rows]
         except Exception as e:
             logger.error(f"Error executing query: {e}")
             raise
     
+    @staticmethod
+    @contextmanager
+    def session():
+        """
+        Pin one pooled connection for every query this thread runs in the block.
+        
+        Saves a pool checkout per query and lets consecutive queries share
+        the connection's prepared statements. Nested sessions reuse the outer
+        connection; run_concurrently workers still check out their own.
+        
+        Yields:
+            type: LogisticsQueries, for `with LogisticsQueries.session() as q:`
+        """
+        if getattr(_session, 'conn', None) is not None:
+            yield LogisticsQueries
+            return
+        
+        _session.conn = get_connection()
+        try:
+            yield LogisticsQueries
+        finally:
+            conn, _session.conn = _session.conn, None
+            conn.close()
+    
+    @staticmethod
+    def run_concurrently(*names):
+        """
+        Run independent query methods in parallel, each on its own pooled connection.
+        
+        Wall-clock time becomes that of the slowest query rather than the
+        sum of all of them.
+        
+        Args:
+            *names (str): Names of LogisticsQueries methods that take no arguments
+            
+        Returns:
+            dict: Method name to its result
+        """
+        if not names:
+            return {}
+        with ThreadPoolExecutor(max_workers=min(len(names), QUERY_WORKERS)) as executor:
+            futures = {name: executor.submit(getattr(LogisticsQueries, name)) for name in names}
+            return {name: future.result() for name, future in futures.items()}
+    
     # ========== OPERATIONAL KPIs ==========
     
+    @staticmethod
+    @ttl_cached(KPI_TTL_SECONDS)
+    def get_operational_kpis(days=None):
+        """
+        Get all headline KPIs from one aggregate query.
+        
+        The result is memoized for KPI_TTL_SECONDS, so the individual KPI
+        getters below share a single shipments scan. clear_caches() drops it.
+        
+        Args:
+            days (int): Only count shipments ordered in the last N days; all when None
+            
+        Returns:
+            dict: 'total', 'delivered_pct', 'cancelled_pct', 'intransit_pct',
+            'avg_days' and 'total_cost'
+        """
+        if days is None:
+            window, cost_window, params = "", "", None
+        else:
+            window = "WHERE order_date >= CURDATE() - INTERVAL %s DAY"
+            cost_window = """JOIN shipments s ON s.shipment_id = c.shipment_id
+                             WHERE s.order_date >= CURDATE() - INTERVAL %s DAY"""
+            params = (days, days)
+        
+        query = f"""
+            SELECT 
+                COUNT(*) as total,
+                SUM(status = 'Delivered') as delivered,
+                SUM(status = 'Cancelled') as cancelled,
+                SUM(status = 'In Transit') as intransit,
+                ROUND(AVG(CASE WHEN status = 'Delivered' AND delivery_date IS NOT NULL
+                               THEN DATEDIFF(delivery_date, order_date) END), 2) as avg_days,
+                (SELECT ROUND(SUM(c.total_cost), 2) FROM costs c {cost_window}) as total_cost
+            FROM shipments
+            {window}
+        """
+        row = LogisticsQueries._fetch_row(query, params)
+        total = int(row['total'] or 0)
+        return {
+            'total': total,
+            'delivered_pct': round(float(row['delivered']) * 100.0 / total, 2) if total else None,
+            'cancelled_pct': round(float(row['cancelled']) * 100.0 / total, 2) if total else None,
+            'intransit_pct': round(float(row['intransit']) * 100.0 / total, 2) if total else None,
+            'avg_days': None if row['avg_days'] is None else float(row['avg_days']),
+            'total_cost': None if row['total_cost'] is None else float(row['total_cost']),
+        }
+    
+    @staticmethod
+    def clear_caches():
+        """Drop every TTL-cached result, e.g. after new data is loaded."""
+        for cache in _ttl_caches:
+            cache.clear()
+    
     @staticmethod
     def get_total_shipments():
         """Get total number of shipments."""
-        query = "SELECT COUNT(*) as total_shipments FROM shipments"
-        result = LogisticsQueries.get_connection_and_execute(query)
-        return result.iloc[0, 0]
+        return LogisticsQueries.get_operational_kpis()['total']
     
     @staticmethod
     def get_delivered_percentage():
         """Get percentage of delivered shipments."""
-        query = """
-            SELECT 
-                ROUND(COUNT(CASE WHEN status = 'Delivered' THEN 1 END) * 100.0 / COUNT(*), 2) 
-                as delivered_percentage
-            FROM shipments
-        """
-        result = LogisticsQueries.get_connection_and_execute(query)
-        return result.iloc[0, 0]
+        return LogisticsQueries.get_operational_kpis()['delivered_pct']
     
     @staticmethod
     def get_cancelled_percentage():
         """Get percentage of cancelled shipments."""
-        query = """
-            SELECT 
-                ROUND(COUNT(CASE WHEN status = 'Cancelled' THEN 1 END) * 100.0 / COUNT(*), 2) 
-                as cancelled_percentage
-            FROM shipments
-        """
-        result = LogisticsQueries.get_connection_and_execute(query)
-        return result.iloc[0, 0]
+        return LogisticsQueries.get_operational_kpis()['cancelled_pct']
     
     @staticmethod
     def get_intransit_percentage():
         """Get percentage of in-transit shipments."""
-        query = """
-            SELECT 
-                ROUND(COUNT(CASE WHEN status = 'In Transit' THEN 1 END) * 100.0 / COUNT(*), 2) 
-                as intransit_percentage
-            FROM shipments
-        """
-        result = LogisticsQueries.get_connection_and_execute(query)
-        return result.iloc[0, 0]
+        return LogisticsQueries.get_operational_kpis()['intransit_pct']
     
     @staticmethod
     def get_average_delivery_time():
         """Get average delivery time in days."""
-        query = """
-            SELECT 
-                ROUND(AVG(DATEDIFF(delivery_date, order_date)), 2) as avg_delivery_days
-            FROM shipments
-            WHERE status = 'Delivered' AND delivery_date IS NOT NULL
-        """
-        result = LogisticsQueries.get_connection_and_execute(query)
-        return result.iloc[0, 0]
+        return LogisticsQueries.get_operational_kpis()['avg_days']
     
     @staticmethod
     def get_total_operational_cost():
         """Get total operational cost across all shipments."""
-        query = """
-            SELECT 
-                ROUND(SUM(fuel_cost + labor_cost + misc_cost), 2) as total_cost
-            FROM costs
-        """
-        result = LogisticsQueries.get_connection_and_execute(query)
-        return result.iloc[0, 0]
+        return LogisticsQueries.get_operational_kpis()['total_cost']
     
     # ========== DELIVERY PERFORMANCE ==========
     
     @staticmethod
+    @ttl_cached(RESULT_TTL_SECONDS)
     def get_average_delivery_time_per_route():
         """Get average delivery time by route."""
         query = """
             SELECT 
-                s.origin,
-                s.destination,
-                ROUND(AVG(DATEDIFF(s.delivery_date, s.order_date)), 2) as avg_days,
-                COUNT(s.shipment_id) as num_shipments,
-                r.distance_km,
-                r.avg_time_hours
-            FROM shipments s
-            LEFT JOIN routes r ON s.origin = r.origin AND s.destination = r.destination
-            WHERE s.status = 'Delivered' AND s.delivery_date IS NOT NULL
-            GROUP BY s.origin, s.destination, r.distance_km, r.avg_time_hours
+                origin,
+                destination,
+                ROUND(AVG(delivery_days), 2) as avg_days,
+                COUNT(shipment_id) as num_shipments,
+                distance_km,
+                avg_time_hours
+            FROM shipment_facts
+            WHERE status = 'Delivered' AND delivery_date IS NOT NULL
+            GROUP BY origin, destination, distance_km, avg_time_hours
             ORDER BY avg_days DESC
             LIMIT 20
         """
         return LogisticsQueries.get_connection_and_execute(query)
     
     @staticmethod
+    @ttl_cached(RESULT_TTL_SECONDS)
     def get_most_delayed_routes():
         """Get top delayed routes with shipment counts."""
         query = """
             SELECT 
-                s.origin,
-                s.destination,
-                ROUND(AVG(DATEDIFF(s.delivery_date, s.order_date)), 2) as avg_delivery_days,
-                COUNT(s.shipment_id) as num_shipments,
-                r.avg_time_hours,
-                ROUND(r.distance_km, 2) as distance_km
-            FROM shipments s
-            LEFT JOIN routes r ON s.origin = r.origin AND s.destination = r.destination
-            WHERE s.status = 'Delivered' AND s.delivery_date IS NOT NULL
-            GROUP BY s.origin, s.destination, r.avg_time_hours, r.distance_km
+                origin,
+                destination,
+                ROUND(AVG(delivery_days), 2) as avg_delivery_days,
+                COUNT(shipment_id) as num_shipments,
+                avg_time_hours,
+                ROUND(distance_km, 2) as distance_km
+            FROM shipment_facts
+            WHERE status = 'Delivered' AND delivery_date IS NOT NULL
+            GROUP BY origin, destination, avg_time_hours, distance_km
             ORDER BY avg_delivery_days DESC
             LIMIT 15
         """
         return LogisticsQueries.get_connection_and_execute(query)
     
     @staticmethod
+    @ttl_cached(RESULT_TTL_SECONDS)
     def get_delivery_time_vs_distance():
-        """Compare delivery time ratio against distance."""
+        """Compare delivery time ratio against distance for every delivered route."""
         query = """
             SELECT 
-                s.origin,
-                s.destination,
-                ROUND(r.distance_km, 2) as distance_km,
-                ROUND(AVG(DATEDIFF(s.delivery_date, s.order_date)), 2) as avg_delivery_days,
-                ROUND(r.avg_time_hours / 24, 2) as expected_days,
-                ROUND(AVG(DATEDIFF(s.delivery_date, s.order_date)) - (r.avg_time_hours / 24), 2) as delay_days,
-                COUNT(s.shipment_id) as num_shipments
-            FROM shipments s
-            LEFT JOIN routes r ON s.origin = r.origin AND s.destination = r.destination
-            WHERE s.status = 'Delivered' AND s.delivery_date IS NOT NULL
-            GROUP BY s.origin, s.destination, r.distance_km, r.avg_time_hours
+                origin,
+                destination,
+                CAST(distance_km AS DOUBLE) as distance_km,
+                CAST(ROUND(AVG(delivery_days), 2) AS DOUBLE) as avg_delivery_days,
+                CAST(ROUND(avg_time_hours / 24, 2) AS DOUBLE) as expected_days,
+                CAST(ROUND(AVG(delivery_days) - (avg_time_hours / 24), 2) AS DOUBLE) as delay_days,
+                COUNT(shipment_id) as num_shipments
+            FROM shipment_facts
+            WHERE status = 'Delivered' AND delivery_date IS NOT NULL
+            GROUP BY origin, destination, distance_km, avg_time_hours
             ORDER BY delay_days DESC
-            LIMIT 20
         """
         return LogisticsQueries.get_connection_and_execute(query)
     
     # ========== COURIER PERFORMANCE ==========
     
     @staticmethod
+    @ttl_cached(RESULT_TTL_SECONDS)
     def get_courier_performance():
         """Get shipment statistics per courier."""
         query = """
@@ -181,18 +576,37 @@ class LogisticsQueries:
                 c.vehicle_type,
                 c.rating,
                 COUNT(s.shipment_id) as num_shipments,
-                COUNT(CASE WHEN s.status = 'Delivered' THEN 1 END) as delivered_count,
-                COUNT(CASE WHEN s.status = 'Cancelled' THEN 1 END) as cancelled_count,
-                ROUND(COUNT(CASE WHEN s.status = 'Delivered' THEN 1 END) * 100.0 / COUNT(s.shipment_id), 2) as delivery_rate
+                COALESCE(SUM(s.status = 'Delivered'), 0) as delivered_count,
+                COALESCE(SUM(s.status = 'Cancelled'), 0) as cancelled_count
             FROM courier_staff c
-            LEFT JOIN shipments s ON c.courier_id = s.courier_id
+            LEFT JOIN shipment_facts s ON c.courier_id = s.courier_id
             GROUP BY c.courier_id, c.name, c.vehicle_type, c.rating
             ORDER BY num_shipments DESC
             LIMIT 30
         """
-        return LogisticsQueries.get_connection_and_execute(query)
+        df = LogisticsQueries.get_connection_and_execute(query)
+        df['delivery_rate'] = percent(df['delivered_count'], df['num_shipments'])
+        return df
     
     @staticmethod
+    @ttl_cached(RESULT_TTL_SECONDS)
+    def get_top_couriers(metric='shipments', limit=10):
+        """
+        Get the couriers ranked highest by one metric, ranked and limited by MySQL.
+        
+        Args:
+            metric (str): A COURIER_RANKINGS key: 'shipments', 'rating' or 'delivery_rate'
+            limit (int): Number of couriers
+            
+        Returns:
+            pandas.DataFrame: Same columns as get_courier_performance
+        """
+        df = LogisticsQueries.get_connection_and_execute(COURIER_RANKING_SQL[metric], (limit,))
+        df['delivery_rate'] = percent(df['delivered_count'], df['num_shipments'])
+        return df
+    
+    @staticmethod
+    @ttl_cached(RESULT_TTL_SECONDS)
     def get_ontime_delivery_by_courier():
         """Get on-time delivery performance by courier."""
         query = """
@@ -201,28 +615,28 @@ class LogisticsQueries:
                 c.name,
                 c.rating,
                 COUNT(s.shipment_id) as total_shipments,
-                COUNT(CASE WHEN s.status = 'Delivered' THEN 1 END) as delivered,
-                ROUND(AVG(DATEDIFF(s.delivery_date, s.order_date)), 2) as avg_days,
-                ROUND(COUNT(CASE WHEN s.status = 'Delivered' THEN 1 END) * 100.0 / COUNT(s.shipment_id), 2) as delivery_success_rate
+                SUM(s.status = 'Delivered') as delivered,
+                ROUND(AVG(s.delivery_days), 2) as avg_days
             FROM courier_staff c
-            LEFT JOIN shipments s ON c.courier_id = s.courier_id
+            JOIN shipment_facts s ON c.courier_id = s.courier_id
             WHERE s.status = 'Delivered' AND s.delivery_date IS NOT NULL
             GROUP BY c.courier_id, c.name, c.rating
-            HAVING delivered > 0
-            ORDER BY delivery_success_rate DESC, avg_days ASC
+            ORDER BY SUM(s.status = 'Delivered') / COUNT(s.shipment_id) DESC, avg_days ASC
             LIMIT 20
         """
-        return LogisticsQueries.get_connection_and_execute(query)
+        df = LogisticsQueries.get_connection_and_execute(query)
+        df['delivery_success_rate'] = percent(df['delivered'], df['total_shipments'])
+        return df
     
     @staticmethod
+    @ttl_cached(RESULT_TTL_SECONDS)
     def get_courier_rating_comparison():
         """Compare courier performance by rating."""
         query = """
             SELECT 
                 c.rating,
                 COUNT(s.shipment_id) as num_shipments,
-                COUNT(CASE WHEN s.status = 'Delivered' THEN 1 END) as delivered,
-                ROUND(COUNT(CASE WHEN s.status = 'Delivered' THEN 1 END) * 100.0 / COUNT(s.shipment_id), 2) as delivery_rate,
+                SUM(s.status = 'Delivered') as delivered,
                 ROUND(AVG(DATEDIFF(s.delivery_date, s.order_date)), 2) as avg_delivery_days
             FROM courier_staff c
             LEFT JOIN shipments s ON c.courier_id = s.courier_id
@@ -230,79 +644,108 @@ class LogisticsQueries:
             GROUP BY c.rating
             ORDER BY c.rating DESC
         """
-        return LogisticsQueries.get_connection_and_execute(query)
+        df = LogisticsQueries.get_connection_and_execute(query)
+        df['delivery_rate'] = percent(df['delivered'], df['num_shipments'])
+        return df
     
     # ========== COST ANALYTICS ==========
     
     @staticmethod
-    def get_cost_per_shipment():
-        """Get individual shipment costs with details."""
+    @ttl_cached(RESULT_TTL_SECONDS)
+    def get_cost_per_shipment(limit=20):
+        """Get the most expensive shipments with cost breakdown and cost per kg."""
         query = """
             SELECT 
-                c.shipment_id,
-                s.origin,
-                s.destination,
-                s.weight,
-                ROUND(c.fuel_cost, 2) as fuel_cost,
-                ROUND(c.labor_cost, 2) as labor_cost,
-                ROUND(c.misc_cost, 2) as misc_cost,
-                ROUND(c.fuel_cost + c.labor_cost + c.misc_cost, 2) as total_cost,
-                s.status
-            FROM costs c
-            JOIN shipments s ON c.shipment_id = s.shipment_id
-            ORDER BY (c.fuel_cost + c.labor_cost + c.misc_cost) DESC
-            LIMIT 50
+                shipment_id,
+                origin,
+                destination,
+                CAST(weight AS DOUBLE) as weight,
+                CAST(fuel_cost AS DOUBLE) as fuel_cost,
+                CAST(labor_cost AS DOUBLE) as labor_cost,
+                CAST(misc_cost AS DOUBLE) as misc_cost,
+                CAST(total_cost AS DOUBLE) as total_cost,
+                status,
+                CAST(ROUND(total_cost / NULLIF(weight, 0), 2) AS DOUBLE) as cost_per_kg
+            FROM shipment_facts
+            WHERE total_cost IS NOT NULL
+            ORDER BY shipment_facts.total_cost DESC
+            LIMIT %s
         """
-        return LogisticsQueries.get_connection_and_execute(query)
+        return LogisticsQueries.get_connection_and_execute(query, (limit,))
     
     @staticmethod
+    @ttl_cached(RESULT_TTL_SECONDS)
     def get_cost_per_route():
         """Get aggregate costs by route."""
         query = """
             SELECT 
-                s.origin,
-                s.destination,
-                ROUND(SUM(c.fuel_cost), 2) as total_fuel_cost,
-                ROUND(SUM(c.labor_cost), 2) as total_labor_cost,
-                ROUND(SUM(c.misc_cost), 2) as total_misc_cost,
-                ROUND(SUM(c.fuel_cost + c.labor_cost + c.misc_cost), 2) as total_cost,
-                COUNT(c.shipment_id) as num_shipments,
-                ROUND(AVG(c.fuel_cost + c.labor_cost + c.misc_cost), 2) as avg_cost_per_shipment
-            FROM costs c
-            JOIN shipments s ON c.shipment_id = s.shipment_id
-            GROUP BY s.origin, s.destination
+                origin,
+                destination,
+                CAST(SUM(fuel_cost) AS DOUBLE) as total_fuel_cost,
+                CAST(SUM(labor_cost) AS DOUBLE) as total_labor_cost,
+                CAST(SUM(misc_cost) AS DOUBLE) as total_misc_cost,
+                CAST(SUM(shipment_facts.total_cost) AS DOUBLE) as total_cost,
+                COUNT(shipment_id) as num_shipments,
+                CAST(ROUND(AVG(shipment_facts.total_cost), 2) AS DOUBLE) as avg_cost_per_shipment
+            FROM shipment_facts
+            WHERE shipment_facts.total_cost IS NOT NULL
+            GROUP BY origin, destination
             ORDER BY total_cost DESC
             LIMIT 25
         """
         return LogisticsQueries.get_connection_and_execute(query)
     
     @staticmethod
+    @ttl_cached(RESULT_TTL_SECONDS)
     def get_fuel_vs_labor_contribution():
         """Get fuel vs labor cost contribution percentages."""
         query = """
             SELECT 
-                ROUND(SUM(fuel_cost) * 100.0 / (SUM(fuel_cost) + SUM(labor_cost) + SUM(misc_cost)), 2) as fuel_percent,
-                ROUND(SUM(labor_cost) * 100.0 / (SUM(fuel_cost) + SUM(labor_cost) + SUM(misc_cost)), 2) as labor_percent,
-                ROUND(SUM(misc_cost) * 100.0 / (SUM(fuel_cost) + SUM(labor_cost) + SUM(misc_cost)), 2) as misc_percent
+                CAST(ROUND(SUM(fuel_cost) * 100.0 / (SUM(fuel_cost) + SUM(labor_cost) + SUM(misc_cost)), 2) AS DOUBLE) as fuel_percent,
+                CAST(ROUND(SUM(labor_cost) * 100.0 / (SUM(fuel_cost) + SUM(labor_cost) + SUM(misc_cost)), 2) AS DOUBLE) as labor_percent,
+                CAST(ROUND(SUM(misc_cost) * 100.0 / (SUM(fuel_cost) + SUM(labor_cost) + SUM(misc_cost)), 2) AS DOUBLE) as misc_percent
             FROM costs
         """
         return LogisticsQueries.get_connection_and_execute(query)
     
     @staticmethod
+    @ttl_cached(RESULT_TTL_SECONDS)
+    def get_fuel_vs_labor_contribution_scalars():
+        """
+        Get fuel, labor and misc cost contribution percentages as plain floats.
+        
+        Reads the single aggregate row directly, skipping DataFrame
+        construction entirely.
+        
+        Returns:
+            tuple: (fuel_pct, labor_pct, misc_pct), all None when there are no costs
+        """
+        query = """
+            SELECT 
+                CAST(ROUND(SUM(fuel_cost) * 100.0 / (SUM(fuel_cost) + SUM(labor_cost) + SUM(misc_cost)), 2) AS DOUBLE) as fuel_percent,
+                CAST(ROUND(SUM(labor_cost) * 100.0 / (SUM(fuel_cost) + SUM(labor_cost) + SUM(misc_cost)), 2) AS DOUBLE) as labor_percent,
+                CAST(ROUND(SUM(misc_cost) * 100.0 / (SUM(fuel_cost) + SUM(labor_cost) + SUM(misc_cost)), 2) AS DOUBLE) as misc_percent
+            FROM costs
+        """
+        row = LogisticsQueries._fetch_row(query)
+        return tuple(None if value is None else float(value) for value in row.values())
+    
+    @staticmethod
+    @ttl_cached(RESULT_TTL_SECONDS)
     def get_high_cost_shipments():
         """Get shipments with highest costs."""
         query = """
             SELECT 
-                c.shipment_id,
-                s.origin,
-                s.destination,
-                s.weight,
-                ROUND(c.fuel_cost + c.labor_cost + c.misc_cost, 2) as total_cost,
-                ROUND((c.fuel_cost + c.labor_cost + c.misc_cost) / NULLIF(s.weight, 0), 2) as cost_per_kg,
-                s.status
-            FROM costs c
-            JOIN shipments s ON c.shipment_id = s.shipment_id
-            ORDER BY (c.fuel_cost + c.labor_cost + c.misc_cost) DESC
+                shipment_id,
+                origin,
+                destination,
+                CAST(weight AS DOUBLE) as weight,
+                CAST(total_cost AS DOUBLE) as total_cost,
+                CAST(ROUND(total_cost / NULLIF(weight, 0), 2) AS DOUBLE) as cost_per_kg,
+                status
+            FROM shipment_facts
+            WHERE total_cost IS NOT NULL
+            ORDER BY shipment_facts.total_cost DESC
             LIMIT 30
         """
         return LogisticsQueries.get_connection_and_execute(query)
@@ -310,41 +753,56 @@ class LogisticsQueries:
     # ========== CANCELLATION ANALYSIS ==========
     
     @staticmethod
+    @ttl_cached(RESULT_TTL_SECONDS)
     def get_cancellation_rate_by_origin():
         """Get cancellation rate by origin city."""
         query = """
             SELECT 
                 origin,
                 COUNT(shipment_id) as total_shipments,
-                COUNT(CASE WHEN status = 'Cancelled' THEN 1 END) as cancelled,
-                ROUND(COUNT(CASE WHEN status = 'Cancelled' THEN 1 END) * 100.0 / COUNT(shipment_id), 2) as cancellation_rate
+                SUM(status = 'Cancelled') as cancelled
             FROM shipments
             GROUP BY origin
-            ORDER BY cancellation_rate DESC
+            ORDER BY SUM(status = 'Cancelled') / COUNT(shipment_id) DESC
             LIMIT 25
         """
-        return LogisticsQueries.get_connection_and_execute(query)
+        df = LogisticsQueries.get_connection_and_execute(query)
+        df['cancellation_rate'] = percent(df['cancelled'], df['total_shipments'])
+        return df
     
     @staticmethod
-    def get_cancellation_rate_by_courier():
-        """Get cancellation rate by courier."""
-        query = """
+    @ttl_cached(RESULT_TTL_SECONDS)
+    def get_cancellation_rate_by_courier(min_rate=None):
+        """
+        Get cancellation rate by courier.
+        
+        Args:
+            min_rate (float): Only return couriers cancelling more than this percentage
+        """
+        having, params = "", None
+        if min_rate is not None:
+            having = "HAVING SUM(s.status = 'Cancelled') * 100.0 / COUNT(s.shipment_id) > %s"
+            params = (min_rate,)
+        
+        query = f"""
             SELECT 
                 c.courier_id,
                 c.name,
                 COUNT(s.shipment_id) as total_shipments,
-                COUNT(CASE WHEN s.status = 'Cancelled' THEN 1 END) as cancelled,
-                ROUND(COUNT(CASE WHEN s.status = 'Cancelled' THEN 1 END) * 100.0 / COUNT(s.shipment_id), 2) as cancellation_rate
+                SUM(s.status = 'Cancelled') as cancelled
             FROM courier_staff c
-            LEFT JOIN shipments s ON c.courier_id = s.courier_id
+            JOIN shipments s ON c.courier_id = s.courier_id
             GROUP BY c.courier_id, c.name
-            HAVING total_shipments > 0
-            ORDER BY cancellation_rate DESC
+            {having}
+            ORDER BY SUM(s.status = 'Cancelled') / COUNT(s.shipment_id) DESC
             LIMIT 20
         """
-        return LogisticsQueries.get_connection_and_execute(query)
+        df = LogisticsQueries.get_connection_and_execute(query, params)
+        df['cancellation_rate'] = percent(df['cancelled'], df['total_shipments'])
+        return df
     
     @staticmethod
+    @ttl_cached(RESULT_TTL_SECONDS)
     def get_time_to_cancellation():
         """Get average time from order to cancellation."""
         query = """
@@ -365,6 +823,7 @@ class LogisticsQueries:
     # ========== WAREHOUSE INSIGHTS ==========
     
     @staticmethod
+    @ttl_cached(RESULT_TTL_SECONDS)
     def get_warehouse_capacity_comparison():
         """Get warehouse capacity and utilization."""
         query = """
@@ -384,6 +843,7 @@ class LogisticsQueries:
         return LogisticsQueries.get_connection_and_execute(query)
     
     @staticmethod
+    @ttl_cached(RESULT_TTL_SECONDS)
     def get_high_traffic_warehouses():
         """Get warehouses with highest traffic."""
         query = """
@@ -406,49 +866,112 @@ class LogisticsQueries:
     
     @staticmethod
     def search_shipment(shipment_id):
-        """Search for a shipment by ID."""
+        """
+        Search for a shipment by ID.
+        
+        Returns:
+            dict: The shipment's columns plus total_cost, or an empty dict if not found
+        """
         query = """
             SELECT 
                 s.*,
-                c.fuel_cost + c.labor_cost + c.misc_cost as total_cost
+                c.total_cost
             FROM shipments s
             LEFT JOIN costs c ON s.shipment_id = c.shipment_id
             WHERE s.shipment_id = %s
         """
-        return LogisticsQueries.get_connection_and_execute(query, (shipment_id,))
+        return LogisticsQueries._fetch_row(query, (shipment_id,))
+    
+    @staticmethod
+    def _shipment_filter_mask(status=None, origin=None, destination=None, start_date=None, end_date=None, courier_id=None):
+        """
+        Encode which shipment filters are set.
+        
+        Returns:
+            tuple: (bitmask over SHIPMENT_FILTERS, parameters in the same order)
+        """
+        values = (status, origin, destination, start_date, end_date, courier_id)
+        mask = sum(1 << bit for bit, value in enumerate(values) if value)
+        return mask, [value for value in values if value]
+    
+    @staticmethod
+    def iter_filtered_shipments(batch=500, limit=None, offset=0, **filters):
+        """
+        Stream shipments matching the filters in batches.
+        
+        Uses an unbuffered cursor, so rows are pulled from the server with
+        fetchmany as they are consumed instead of being buffered client-side.
+        
+        Args:
+            batch (int): Rows per yielded batch
+            limit (int): Optional maximum number of rows
+            offset (int): Rows to skip when limit is given
+            **filters: Same keyword filters as filter_shipments
+            
+        Yields:
+            list: Up to `batch` rows, each a dict keyed by column name
+        """
+        mask, params = LogisticsQueries._shipment_filter_mask(**filters)
+        if limit is None:
+            query = FILTER_ROWS_SQL[mask]
+        else:
+            query = FILTER_PAGE_SQL[mask]
+            params.extend([limit, offset])
+        
+        with pooled_connection() as conn, conn.cursor(dictionary=True, buffered=False) as cursor:
+            try:
+                cursor.execute(query, tuple(params))
+                while True:
+                    rows = cursor.fetchmany(batch)
+                    if not rows:
+                        break
+                    yield rows
+            finally:
+                # Drain anything left unread if the consumer stopped early,
+                # otherwise the pool refuses the connection back
+                conn.consume_results()
     
     @staticmethod
-    def filter_shipments(status=None, origin=None, destination=None, start_date=None, end_date=None, courier_id=None):
-        """Filter shipments based on multiple criteria."""
-        query = "SELECT * FROM shipments WHERE 1=1"
-        params = []
+    def filter_shipments(status=None, origin=None, destination=None, start_date=None, end_date=None,
+                         courier_id=None, limit=1000, offset=0):
+        """
+        Filter shipments based on multiple criteria.
         
-        if status:
-            query += " AND status = %s"
-            params.append(status)
-        if origin:
-            query += " AND origin = %s"
-            params.append(origin)
-        if destination:
-            query += " AND destination = %s"
-            params.append(destination)
-        if start_date:
-            query += " AND order_date >= %s"
-            params.append(start_date)
-        if end_date:
-            query += " AND order_date <= %s"
-            params.append(end_date)
-        if courier_id:
-            query += " AND courier_id = %s"
-            params.append(courier_id)
+        Use limit/offset to fetch one page at a time; get_shipment_filter_summary
+        returns the total match count. Only the requested page is materialized.
+        """
+        batches = LogisticsQueries.iter_filtered_shipments(
+            batch=limit, limit=limit, offset=offset,
+            status=status, origin=origin, destination=destination,
+            start_date=start_date, end_date=end_date, courier_id=courier_id)
         
-        query += " LIMIT 1000"
+        # Close the generator here, not whenever it is garbage collected, so
+        # the cursor is released while a pinned session connection is still open
+        with closing(batches):
+            return pd.DataFrame.from_records([row for rows in batches for row in rows])
+    
+    @staticmethod
+    def get_shipment_filter_summary(status=None, origin=None, destination=None, start_date=None, end_date=None, courier_id=None):
+        """
+        Count all shipments matching the filters, split by outcome.
         
-        return LogisticsQueries.get_connection_and_execute(query, tuple(params) if params else None)
+        Returns:
+            dict: 'total', 'delivered' and 'cancelled' counts
+        """
+        mask, params = LogisticsQueries._shipment_filter_mask(
+            status, origin, destination, start_date, end_date, courier_id)
+        row = LogisticsQueries._fetch_row(FILTER_SUMMARY_SQL[mask], params)
+        return {column: int(value or 0) for column, value in row.items()}
     
     @staticmethod
     def get_shipment_tracking_history(shipment_id):
-        """Get complete tracking history for a shipment."""
+        """
+        Get complete tracking history for a shipment.
+        
+        Returns:
+            list: Tracking events in time order, each a dict with
+            tracking_id, status and timestamp
+        """
         query = """
             SELECT 
                 tracking_id,
@@ -458,31 +981,60 @@ class LogisticsQueries:
             WHERE shipment_id = %s
             ORDER BY timestamp ASC
         """
-        return LogisticsQueries.get_connection_and_execute(query, (shipment_id,))
+        return LogisticsQueries._fetch_all_dicts(query, (shipment_id,))
+    
+    @staticmethod
+    @ttl_cached(FILTER_OPTIONS_TTL_SECONDS)
+    def get_filter_options():
+        """
+        Get every shipment search dropdown list in a single round-trip.
+        
+        The result is memoized for FILTER_OPTIONS_TTL_SECONDS; these
+        domains rarely change.
+        
+        Returns:
+            dict: 'origins', 'destinations' and 'statuses' value lists, plus
+            'couriers' as a list of (courier_id, name) pairs
+        """
+        query = """
+            SELECT DISTINCT 'origin' as kind, origin as value, NULL as name, origin as sort_key FROM shipments
+            UNION ALL
+            SELECT DISTINCT 'destination', destination, NULL, destination FROM shipments
+            UNION ALL
+            SELECT DISTINCT 'status', status, NULL, status FROM shipments
+            UNION ALL
+            SELECT 'courier', courier_id, name, name FROM courier_staff
+            ORDER BY kind, sort_key
+        """
+        options = {'origins': [], 'destinations': [], 'statuses': [], 'couriers': []}
+        with pooled_connection() as conn:
+            cursor = execute_prepared(conn, query)
+            for kind, value, name, _ in cursor.fetchall():
+                if kind == 'courier':
+                    options['couriers'].append((value, name))
+                else:
+                    options[kind + 's'].append(value)
+        return options
     
     @staticmethod
     def get_unique_origins():
         """Get list of unique origin cities."""
-        query = "SELECT DISTINCT origin FROM shipments ORDER BY origin"
-        return LogisticsQueries.get_connection_and_execute(query)
+        return pd.DataFrame({'origin': LogisticsQueries.get_filter_options()['origins']})
     
     @staticmethod
     def get_unique_destinations():
         """Get list of unique destination cities."""
-        query = "SELECT DISTINCT destination FROM shipments ORDER BY destination"
-        return LogisticsQueries.get_connection_and_execute(query)
+        return pd.DataFrame({'destination': LogisticsQueries.get_filter_options()['destinations']})
     
     @staticmethod
     def get_unique_couriers():
         """Get list of unique couriers."""
-        query = "SELECT courier_id, name FROM courier_staff ORDER BY name"
-        return LogisticsQueries.get_connection_and_execute(query)
+        return pd.DataFrame(LogisticsQueries.get_filter_options()['couriers'], columns=['courier_id', 'name'])
     
     @staticmethod
     def get_shipment_statuses():
         """Get list of unique shipment statuses."""
-        query = "SELECT DISTINCT status FROM shipments ORDER BY status"
-        return LogisticsQueries.get_connection_and_execute(query)
+        return pd.DataFrame({'status': LogisticsQueries.get_filter_options()['statuses']})
 
 
 if __name__ == "__main__":
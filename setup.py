@@ -6,6 +6,8 @@ Run this once to set up the database schema and load initial data.
 import sys
 import logging
 from pathlib import Path
+from database import create_tables, drop_all_tables, get_connection
+from queries import LogisticsQueries
 
 # Configure logging
 logging.basicConfig(
@@ -27,7 +29,6 @@ def setup_project():
     try:
         # Step 1: Database Initialization
         print("Step 1: Initializing Database Schema...")
-        from database import create_tables, drop_all_tables
         
         reset = input("Do you want to reset existing tables? (yes/no): ").lower()
         if reset == 'yes':
@@ -55,7 +56,6 @@ def setup_project():
         
         # Step 3: Verification
         print("Step 3: Verifying Data...")
-        from queries import LogisticsQueries
         
         try:
             total = LogisticsQueries.get_total_shipments()
@@ -80,35 +80,42 @@ def setup_project():
         sys.exit(1)
 
 
-def test_connections():
+def test_connections(strict=False):
     """
     Test database connectivity and data availability.
+    
+    By default the shipment count is InnoDB's estimate from
+    information_schema, which needs no table scan.
+    
+    Args:
+        strict (bool): Also run the exact KPI query, scanning shipments
     """
     print("\n" + "="*60)
     print("🔧 Testing System Connections")
     print("="*60 + "\n")
     
     try:
-        from database import get_connection
-        
         print("Testing MySQL connection...")
         conn = get_connection()
         cursor = conn.cursor()
-        cursor.execute("SELECT COUNT(*) FROM information_schema.TABLES WHERE TABLE_SCHEMA = 'logistic'")
-        table_count = cursor.fetchone()[0]
+        cursor.execute("""
+            SELECT COUNT(*), SUM(CASE WHEN TABLE_NAME = 'shipments' THEN TABLE_ROWS END)
+            FROM information_schema.TABLES WHERE TABLE_SCHEMA = 'logistic'
+        """)
+        table_count, estimated_shipments = cursor.fetchone()
         cursor.close()
         conn.close()
         
         print(f"✅ MySQL Connection: OK ({table_count} tables found)")
+        print(f"   - Shipments (estimated): {int(estimated_shipments or 0):,}")
         
-        from queries import LogisticsQueries
-        
-        total_shipments = LogisticsQueries.get_total_shipments()
-        delivered_pct = LogisticsQueries.get_delivered_percentage()
-        
-        print(f"✅ Query Execution: OK")
-        print(f"   - Total Shipments: {total_shipments:,}")
-        print(f"   - Delivered %: {delivered_pct or 0:.1f}%")
+        if strict:
+            total_shipments = LogisticsQueries.get_total_shipments()
+            delivered_pct = LogisticsQueries.get_delivered_percentage()
+            
+            print(f"✅ Query Execution: OK")
+            print(f"   - Total Shipments: {total_shipments:,}")
+            print(f"   - Delivered %: {delivered_pct or 0:.1f}%")
         
         print("\n" + "="*60)
         print("✅ All tests passed! Ready to use.")
@@ -127,6 +134,7 @@ if __name__ == "__main__":
     parser.add_argument('--setup', action='store_true', help='Run complete setup wizard')
     parser.add_argument('--test', action='store_true', help='Test database connections')
     parser.add_argument('--all', action='store_true', help='Run setup and tests')
+    parser.add_argument('--strict', action='store_true', help='Count shipments exactly when testing (full scan)')
     
     args = parser.parse_args()
     
@@ -134,7 +142,7 @@ if __name__ == "__main__":
         setup_project()
     
     if args.test or args.all:
-        test_connections()
+        test_connections(strict=args.strict)
     
     if not any([args.setup, args.test, args.all]):
         print("Usage: python setup.py --setup | --test | --all")
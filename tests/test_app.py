@@ -0,0 +1,37 @@
+"""
+Tests for the chart helpers in app.py.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip("streamlit")
+
+from app import downsample_lttb
+
+
+@pytest.fixture
+def routes_frame():
+    rng = np.random.default_rng(7)
+    distance = rng.uniform(10, 3000, 5000)
+    return pd.DataFrame({
+        'distance_km': distance,
+        'delay_days': np.sin(distance / 200) + rng.normal(0, 0.1, 5000),
+    })
+
+
+def test_downsample_lttb_keeps_threshold_rows_and_endpoints(routes_frame):
+    result = downsample_lttb(routes_frame, 'distance_km', 'delay_days', threshold=500)
+    ordered = routes_frame.sort_values('distance_km')
+    
+    assert len(result) == 500
+    assert result.index[0] == ordered.index[0]
+    assert result.index[-1] == ordered.index[-1]
+    assert result['distance_km'].is_monotonic_increasing
+
+
+def test_downsample_lttb_returns_small_frames_unchanged(routes_frame):
+    small = routes_frame.head(100)
+    
+    assert downsample_lttb(small, 'distance_km', 'delay_days', threshold=500) is small
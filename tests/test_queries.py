@@ -0,0 +1,41 @@
+"""
+Tests for the query result cache in queries.py.
+"""
+
+import time
+
+from queries import _ttl_caches, ttl_cached
+
+
+def test_ttl_cached_evicts_least_recently_used():
+    calls = []
+    
+    @ttl_cached(60, maxsize=2)
+    def lookup(key):
+        calls.append(key)
+        return key
+    
+    lookup(1)
+    lookup(2)
+    lookup(1)
+    lookup(3)
+    lookup(1)
+    lookup(2)
+    
+    assert calls == [1, 2, 3, 2]
+
+
+def test_ttl_cached_purges_expired_entries_on_store(monkeypatch):
+    clock = [0.0]
+    monkeypatch.setattr(time, "monotonic", lambda: clock[0])
+    
+    @ttl_cached(10)
+    def lookup(key):
+        return [key]
+    
+    lookup(1)
+    lookup(2)
+    clock[0] = 15.0
+    lookup(3)
+    
+    assert list(_ttl_caches[-1]) == [(('key', 3),)]
@@ -0,0 +1,46 @@
+"""
+Tests for the export helpers in utils.py.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils import DataExportManager, LogisticsQueries
+
+
+@pytest.fixture
+def shipments_frame():
+    return pd.DataFrame({
+        'shipment_id': [f"SHP{i:05d}" for i in range(50)],
+        'weight': np.linspace(0.5, 25.0, 50),
+        'num_items': np.arange(50, dtype='int64'),
+        'status': ['Delivered', 'Cancelled', 'In Transit', 'Delivered', 'Pending'] * 10,
+        'total_cost': [np.nan if i % 7 == 0 else i * 3.25 for i in range(50)],
+    })
+
+
+@pytest.mark.parametrize("streaming", [True, False])
+def test_export_to_excel_round_trips(tmp_path, shipments_frame, streaming):
+    if streaming:
+        pytest.importorskip("xlsxwriter")
+    pytest.importorskip("openpyxl")
+    path = tmp_path / "export.xlsx"
+    
+    DataExportManager.export_to_excel(shipments_frame, str(path), streaming=streaming)
+    
+    result = pd.read_excel(path, engine="openpyxl")
+    pd.testing.assert_frame_equal(result, shipments_frame, check_dtype=False)
+
+
+def test_export_query_to_csv_appends_streamed_chunks(tmp_path, shipments_frame, monkeypatch):
+    def fake_stream(query, params=None, stream=False):
+        assert stream
+        return (chunk for chunk in (shipments_frame.iloc[:20], shipments_frame.iloc[20:]))
+    
+    monkeypatch.setattr(LogisticsQueries, "get_connection_and_execute", staticmethod(fake_stream))
+    path = tmp_path / "export.csv"
+    
+    DataExportManager.export_query_to_csv("SELECT * FROM shipments", str(path))
+    
+    pd.testing.assert_frame_equal(pd.read_csv(path), shipments_frame, check_dtype=False)
@@ -3,23 +3,108 @@ Utility functions and helpers for the Logistics Analytics Platform.
 Provides common tasks and convenience functions.
 """
 
+import json
+import numpy as np
 import pandas as pd
+from contextlib import closing
 from datetime import datetime, timedelta
-from queries import LogisticsQueries
+from types import MappingProxyType
+from database import DB_CONFIG
+from queries import LogisticsQueries, execute_prepared, pooled_connection, ttl_cached
 import logging
 
+try:
+    # Optional: streams Excel rows to disk instead of building every cell in memory
+    import xlsxwriter
+except ImportError:
+    xlsxwriter = None
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+REPORT_TTL_SECONDS = 300  # How long a performance report is reused per `days`
+
+# All three referential checks in one round trip, each as an anti-join.
+# Kept as one constant so the prepared statement is reused across calls.
+CONSISTENCY_CHECK_SQL = """
+    SELECT
+        (SELECT COUNT(*) FROM shipment_tracking st
+         LEFT JOIN shipments s ON s.shipment_id = st.shipment_id
+         WHERE s.shipment_id IS NULL) AS orphaned_tracking,
+        (SELECT COUNT(*) FROM costs c
+         LEFT JOIN shipments s ON s.shipment_id = c.shipment_id
+         WHERE s.shipment_id IS NULL) AS orphaned_costs,
+        (SELECT COUNT(*) FROM shipments s
+         LEFT JOIN courier_staff c ON c.courier_id = s.courier_id
+         WHERE s.courier_id IS NOT NULL AND c.courier_id IS NULL) AS invalid_couriers
+"""
+
+# Constant advice behind PerformanceTuning.analyze_slow_queries; built once
+# and kept read-only, each caller gets its own dict of lists
+SLOW_QUERY_RECOMMENDATIONS = MappingProxyType({
+    'add_indexes': (
+        'shipments.status',
+        'shipments.courier_id',
+        'shipments.order_date',
+        'shipment_tracking.shipment_id',
+        'costs.shipment_id'
+    ),
+    'optimize_queries': (
+        'Use pagination for large result sets',
+        'Filter by date range when possible',
+        'Use aggregate functions instead of client-side processing'
+    ),
+    'cache_strategy': (
+        'Cache KPI calculations (5-minute refresh)',
+        'Cache dimension tables (1-hour refresh)',
+        'Cache fact tables selectively'
+    )
+})
+
+
+def top_n(df, column, n):
+    """
+    Get the n rows with the largest values in a column, largest first.
+    
+    Same rows and order as DataFrame.nlargest(n, column): ties keep their
+    original order, and NaN rows fill in once the numbers run out. The
+    cutoff is found with np.partition in O(len), and only the n winners
+    are sorted.
+    
+    Args:
+        df (pandas.DataFrame): Data to select from
+        column (str): Column to rank by
+        n (int): Number of rows to keep
+        
+    Returns:
+        pandas.DataFrame: Top rows
+    """
+    n = max(n, 0)
+    values = df[column].to_numpy(dtype='float64', na_value=np.nan)
+    missing = np.isnan(values)
+    candidates = np.flatnonzero(~missing)
+    if n < len(candidates):
+        cutoff = -np.partition(-values[candidates], n - 1)[n - 1] if n else np.inf
+        above = candidates[values[candidates] > cutoff]
+        ties = candidates[values[candidates] == cutoff][:n - len(above)]
+        candidates = np.sort(np.concatenate([above, ties]))
+    ordered = candidates[np.argsort(-values[candidates], kind='stable')]
+    padding = np.flatnonzero(missing)[:n - len(ordered)]
+    return df.iloc[np.concatenate([ordered, padding])]
+
 
 class LogisticsAnalytics:
     """Helper class for advanced analytics and reporting."""
     
     @staticmethod
+    @ttl_cached(REPORT_TTL_SECONDS)
     def generate_performance_report(days=30):
         """
         Generate a comprehensive performance report for the last N days.
         
+        All metrics come from one aggregate query, and the report is reused
+        for REPORT_TTL_SECONDS per `days`.
+        
         Args:
             days (int): Number of days to look back
             
@@ -27,18 +112,19 @@ class LogisticsAnalytics:
             dict: Performance metrics
         """
         try:
+            kpis = LogisticsQueries.get_operational_kpis(days)
             report = {
-                'generated_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                'generated_at': datetime.now().isoformat(sep=' ', timespec='seconds'),
                 'period_days': days,
                 'metrics': {
-                    'total_shipments': LogisticsQueries.get_total_shipments(),
-                    'delivered_percentage': LogisticsQueries.get_delivered_percentage(),
-                    'cancelled_percentage': LogisticsQueries.get_cancelled_percentage(),
-                    'avg_delivery_time': LogisticsQueries.get_average_delivery_time(),
-                    'total_operational_cost': LogisticsQueries.get_total_operational_cost(),
+                    'total_shipments': kpis['total'],
+                    'delivered_percentage': kpis['delivered_pct'],
+                    'cancelled_percentage': kpis['cancelled_pct'],
+                    'avg_delivery_time': kpis['avg_days'],
+                    'total_operational_cost': kpis['total_cost'],
                 }
             }
-            logger.info(f"Performance report generated: {report}")
+            logger.info(f"Performance report generated: {json.dumps(report, default=str)}")
             return report
         except Exception as e:
             logger.error(f"Error generating report: {e}")
@@ -57,16 +143,11 @@ class LogisticsAnalytics:
             pandas.DataFrame: Top performers
         """
         try:
-            df = LogisticsQueries.get_courier_performance()
-            
-            if metric == 'shipments':
-                return df.nlargest(limit, 'num_shipments')
-            elif metric == 'rating':
-                return df.nlargest(limit, 'rating')
-            elif metric == 'delivery_rate':
-                return df.nlargest(limit, 'delivery_rate')
+            if metric in ('shipments', 'rating', 'delivery_rate'):
+                # Ranked over every courier in one SQL pass, not just the busiest 30
+                return LogisticsQueries.get_top_couriers(metric, limit)
             else:
-                return df.head(limit)
+                return LogisticsQueries.get_courier_performance().head(limit)
         except Exception as e:
             logger.error(f"Error getting top performers: {e}")
             raise
@@ -88,8 +169,9 @@ class LogisticsAnalytics:
             if df.empty:
                 return df
             
-            threshold = df['avg_delivery_days'].quantile(threshold_percentile / 100)
-            bottlenecks = df[df['avg_delivery_days'] >= threshold]
+            delays = df['avg_delivery_days'].to_numpy(dtype='float64', na_value=np.nan)
+            threshold = np.nanquantile(delays, threshold_percentile / 100)
+            bottlenecks = df.iloc[delays >= threshold]
             
             logger.info(f"Found {len(bottlenecks)} bottleneck routes")
             return bottlenecks
@@ -106,16 +188,25 @@ class LogisticsAnalytics:
             dict: Cost analysis
         """
         try:
+            # Independent queries, so they run in parallel on pooled connections
+            data = LogisticsQueries.run_concurrently(
+                "get_cost_per_route", "get_high_cost_shipments",
+                "get_fuel_vs_labor_contribution_scalars")
+            # Served from the TTL-cached KPI row, so usually no extra round trip
             total_cost = LogisticsQueries.get_total_operational_cost()
-            cost_by_route = LogisticsQueries.get_cost_per_route()
-            high_cost = LogisticsQueries.get_high_cost_shipments()
-            fuel_vs_labor = LogisticsQueries.get_fuel_vs_labor_contribution()
+            cost_by_route = data["get_cost_per_route"]
+            high_cost = data["get_high_cost_shipments"]
+            fuel_pct, labor_pct, misc_pct = data["get_fuel_vs_labor_contribution_scalars"]
             
             analysis = {
                 'total_operational_cost': total_cost,
-                'high_cost_routes': cost_by_route.nlargest(5, 'total_cost'),
-                'high_cost_shipments': high_cost.nlargest(5, 'total_cost'),
-                'cost_breakdown': fuel_vs_labor.to_dict() if not fuel_vs_labor.empty else {}
+                'high_cost_routes': top_n(cost_by_route, 'total_cost', 5),
+                'high_cost_shipments': top_n(high_cost, 'total_cost', 5),
+                'cost_breakdown': {
+                    'fuel_percent': fuel_pct,
+                    'labor_percent': labor_pct,
+                    'misc_percent': misc_pct,
+                }
             }
             
             logger.info("Cost patterns analysis completed")
@@ -133,8 +224,7 @@ class LogisticsAnalytics:
             pandas.DataFrame: Problematic shipments
         """
         try:
-            cancellation_by_courier = LogisticsQueries.get_cancellation_rate_by_courier()
-            high_cancellation = cancellation_by_courier[cancellation_by_courier['cancellation_rate'] > 10]
+            high_cancellation = LogisticsQueries.get_cancellation_rate_by_courier(min_rate=10)
             
             logger.info(f"Found {len(high_cancellation)} couriers with high cancellation rates")
             return high_cancellation
@@ -163,21 +253,98 @@ class DataExportManager:
             raise
     
     @staticmethod
-    def export_to_excel(data, filename):
+    def export_query_to_csv(query, filename, params=None):
+        """
+        Stream a query's result straight into a CSV file.
+        
+        Rows arrive in DEFAULT_CHUNKSIZE chunks from an unbuffered cursor and
+        are appended as they come, so exports of any size use bounded memory.
+        
+        Args:
+            query (str): SQL query
+            filename (str): Output filename
+            params (tuple): Query parameters
+        """
+        try:
+            chunks = LogisticsQueries.get_connection_and_execute(query, params, stream=True)
+            with closing(chunks), open(filename, 'w', newline='') as f:
+                rows = 0
+                for chunk in chunks:
+                    chunk.to_csv(f, index=False, header=rows == 0)
+                    rows += len(chunk)
+            logger.info(f"Exported {rows} rows to {filename}")
+        except Exception as e:
+            logger.error(f"Error exporting query to CSV: {e}")
+            raise
+    
+    @staticmethod
+    def export_to_excel(data, filename, streaming=True):
         """
         Export DataFrame to Excel file.
         
+        When streaming and xlsxwriter is installed, rows are written one at a
+        time in xlsxwriter's constant_memory mode, so each row is flushed to
+        disk instead of the whole sheet being held in RAM.
+        
         Args:
             data (pandas.DataFrame): Data to export
             filename (str): Output filename
+            streaming (bool): Write row by row with xlsxwriter if available
         """
         try:
-            data.to_excel(filename, index=False)
+            if streaming and xlsxwriter is not None:
+                DataExportManager._write_excel_rows(data, filename)
+            else:
+                data.to_excel(filename, index=False)
             logger.info(f"Data exported to {filename}")
         except Exception as e:
             logger.error(f"Error exporting to Excel: {e}")
             raise
     
+    @staticmethod
+    def _write_excel_rows(data, filename):
+        """
+        Write a DataFrame to .xlsx in row order with constant_memory enabled.
+        
+        pandas' Excel writer fills the sheet column by column, which
+        constant_memory mode cannot accept (cells in flushed rows are
+        silently dropped), so rows are written here directly.
+        
+        Args:
+            data (pandas.DataFrame): Data to export
+            filename (str): Output filename
+        """
+        workbook = xlsxwriter.Workbook(filename, {
+            'constant_memory': True,
+            'remove_timezone': True,
+            'default_date_format': 'yyyy-mm-dd hh:mm:ss',
+        })
+        try:
+            worksheet = workbook.add_worksheet()
+            worksheet.write_row(0, 0, [str(column) for column in data.columns])
+            for row_number, row in enumerate(data.itertuples(index=False, name=None), start=1):
+                # Missing values become empty cells, as with DataFrame.to_excel
+                worksheet.write_row(row_number, 0, [None if pd.isna(value) else value for value in row])
+        finally:
+            workbook.close()
+    
+    @staticmethod
+    def export_to_parquet(data, filename, compression='zstd'):
+        """
+        Export DataFrame to a Parquet file (requires pyarrow).
+        
+        Args:
+            data (pandas.DataFrame): Data to export
+            filename (str): Output filename
+            compression (str): Parquet compression codec
+        """
+        try:
+            data.to_parquet(filename, engine='pyarrow', compression=compression, index=False)
+            logger.info(f"Data exported to {filename}")
+        except Exception as e:
+            logger.error(f"Error exporting to Parquet: {e}")
+            raise
+    
     @staticmethod
     def export_report(report_dict, filename):
         """
@@ -188,9 +355,13 @@ class DataExportManager:
             filename (str): Output filename
         """
         try:
-            with open(filename, 'w') as f:
-                for key, value in report_dict.items():
-                    f.write(f"{key}: {value}\n")
+            # Nested sections (e.g. report metrics) are written as parseable JSON
+            lines = "".join(
+                f"{key}: {json.dumps(value, default=str) if isinstance(value, dict) else value}\n"
+                for key, value in report_dict.items()
+            )
+            with open(filename, 'w', buffering=1 << 20) as f:
+                f.write(lines)
             logger.info(f"Report exported to {filename}")
         except Exception as e:
             logger.error(f"Error exporting report: {e}")
@@ -205,23 +376,39 @@ class DataQualityChecker:
         """
         Check for missing/NULL values in key tables.
         
+        Counts cover every row and are computed by MySQL, so only one row
+        of counts per table is returned.
+        
         Returns:
-            dict: Missing value counts per table
+            dict: Missing value counts per column, per table
         """
         try:
-            from database import get_connection
-            
-            conn = get_connection()
             tables = ['shipments', 'courier_staff', 'routes', 'warehouses', 'costs']
             
             missing_values = {}
             
-            for table in tables:
-                query = f"SELECT * FROM {table} LIMIT 100"
-                df = pd.read_sql(query, conn)
-                missing_values[table] = df.isnull().sum().to_dict()
+            # Unbuffered: rows stream from the server instead of being held client side
+            with pooled_connection() as conn, conn.cursor(buffered=False) as cursor:
+                cursor.execute(f"""
+                    SELECT TABLE_NAME, COLUMN_NAME
+                    FROM information_schema.COLUMNS
+                    WHERE TABLE_SCHEMA = %s AND TABLE_NAME IN ({', '.join(['%s'] * len(tables))})
+                    ORDER BY TABLE_NAME, ORDINAL_POSITION
+                """, (DB_CONFIG['database'], *tables))
+                columns = {}
+                for table, column in cursor.fetchall():
+                    columns.setdefault(table, []).append(column)
+                
+                for table in tables:
+                    names = columns.get(table, [])
+                    if not names:
+                        continue
+                    counts = ", ".join(f"SUM(`{name}` IS NULL)" for name in names)
+                    cursor.execute(f"SELECT {counts} FROM {table}")
+                    # fetchall, not fetchone, so the unbuffered result is fully read
+                    row = cursor.fetchall()[0]
+                    missing_values[table] = {name: int(count or 0) for name, count in zip(names, row)}
             
-            conn.close()
             logger.info("Data quality check completed")
             return missing_values
         except Exception as e:
@@ -237,37 +424,15 @@ class DataQualityChecker:
             dict: Consistency check results
         """
         try:
-            from database import get_connection
-            
-            conn = get_connection()
-            cursor = conn.cursor()
+            with pooled_connection() as conn:
+                cursor = execute_prepared(conn, CONSISTENCY_CHECK_SQL)
+                orphaned_tracking, orphaned_costs, invalid_couriers = cursor.fetchall()[0]
             
-            results = {}
-            
-            # Check orphaned shipment_tracking records
-            cursor.execute("""
-                SELECT COUNT(*) FROM shipment_tracking st
-                WHERE NOT EXISTS (SELECT 1 FROM shipments s WHERE s.shipment_id = st.shipment_id)
-            """)
-            results['orphaned_tracking'] = cursor.fetchone()[0]
-            
-            # Check orphaned costs
-            cursor.execute("""
-                SELECT COUNT(*) FROM costs c
-                WHERE NOT EXISTS (SELECT 1 FROM shipments s WHERE s.shipment_id = c.shipment_id)
-            """)
-            results['orphaned_costs'] = cursor.fetchone()[0]
-            
-            # Check invalid courier references
-            cursor.execute("""
-                SELECT COUNT(*) FROM shipments s
-                WHERE courier_id IS NOT NULL 
-                AND NOT EXISTS (SELECT 1 FROM courier_staff c WHERE c.courier_id = s.courier_id)
-            """)
-            results['invalid_couriers'] = cursor.fetchone()[0]
-            
-            cursor.close()
-            conn.close()
+            results = {
+                'orphaned_tracking': orphaned_tracking,
+                'orphaned_costs': orphaned_costs,
+                'invalid_couriers': invalid_couriers,
+            }
             
             logger.info("Data consistency validation completed")
             return results
@@ -287,26 +452,7 @@ class PerformanceTuning:
         Returns:
             dict: Performance recommendations
         """
-        recommendations = {
-            'add_indexes': [
-                'shipments.status',
-                'shipments.courier_id',
-                'shipments.order_date',
-                'shipment_tracking.shipment_id',
-                'costs.shipment_id'
-            ],
-            'optimize_queries': [
-                'Use pagination for large result sets',
-                'Filter by date range when possible',
-                'Use aggregate functions instead of client-side processing'
-            ],
-            'cache_strategy': [
-                'Cache KPI calculations (5-minute refresh)',
-                'Cache dimension tables (1-hour refresh)',
-                'Cache fact tables selectively'
-            ]
-        }
-        return recommendations
+        return {key: list(values) for key, values in SLOW_QUERY_RECOMMENDATIONS.items()}
     
     @staticmethod
     def get_table_statistics():
@@ -317,8 +463,6 @@ class PerformanceTuning:
             pandas.DataFrame: Table statistics
         """
         try:
-            from database import get_connection
-            
             query = """
                 SELECT 
                     TABLE_NAME,
@@ -329,11 +473,11 @@ class PerformanceTuning:
                 ORDER BY data_length DESC
             """
             
-            conn = get_connection()
-            df = pd.read_sql(query, conn)
-            conn.close()
-            
-            return df
+            # A handful of metadata rows: skip read_sql's inference and build the frame directly
+            with pooled_connection() as conn, conn.cursor() as cursor:
+                cursor.execute(query)
+                return pd.DataFrame.from_records(cursor.fetchall(), columns=cursor.column_names,
+                                                 coerce_float=True)
         except Exception as e:
             logger.error(f"Error getting table statistics: {e}")
             raise